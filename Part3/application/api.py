@@ -0,0 +1,138 @@
+# JSON API，使用 orjson 序列化。URL 规则在 application.urls 中定义，本模块在第一次请求时导入
+import base64
+import binascii
+import datetime
+
+import orjson
+from flask import Response, current_app, request, stream_with_context
+
+from application.export import EXPORTERS, gzip_stream
+from application.http_cache import conditional, users_version
+from application.models import db, Counter
+from application.services import create_users, find_user_by_email, list_users
+
+
+def json_response(data, status=200):
+    return Response(orjson.dumps(data), status=status, mimetype="application/json")
+
+
+# 游标对客户端不透明，内容是上一页最后一个用户的 id
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+# 无效的游标返回 None
+def decode_cursor(cursor):
+    try:
+        last_id = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+
+    return last_id if last_id >= 0 else None
+
+
+# 分页列出用户：GET /api/users?limit=100&cursor=...
+# 只读接口的 ETag 是 users 表的版本，表没有变化时条件请求不会执行查询
+@conditional(users_version, max_age="API_CACHE_MAX_AGE")
+def users():
+    limit = request.args.get("limit", current_app.config["API_PAGE_SIZE"], type=int)
+    if limit <= 0:
+        return json_response({"error": "limit must be a positive integer"}, 400)
+    limit = min(limit, current_app.config["API_MAX_PAGE_SIZE"])
+
+    after_id = 0
+    cursor = request.args.get("cursor")
+    if cursor:
+        after_id = decode_cursor(cursor)
+        if after_id is None:
+            return json_response({"error": "Invalid cursor"}, 400)
+
+    # 多取一行来判断是否还有下一页
+    page = list_users(after_id, limit + 1)
+    next_cursor = encode_cursor(page[limit - 1]["id"]) if len(page) > limit else None
+
+    return json_response({"users": page[:limit], "next_cursor": next_cursor})
+
+
+# 不区分大小写地按邮箱查找用户：GET /api/users/by-email?email=...
+@conditional(users_version, max_age="API_CACHE_MAX_AGE")
+def user_by_email():
+    email = request.args.get("email")
+    if not email:
+        return json_response({"error": "email is required"}, 400)
+
+    user = find_user_by_email(email, current_app.config["USERS_MISSING_EMAIL_TTL"])
+    if user is None:
+        return json_response({"error": "User not found"}, 404)
+
+    return json_response(user)
+
+
+# 流式导出所有用户：GET /api/users/export?format=ndjson|csv
+# 客户端接受 gzip 时边导出边压缩。ETag 是 users 表的版本，users 表没有变化时
+# 根据 If-None-Match 或 If-Modified-Since 直接返回 304
+@conditional(users_version, max_age="API_CACHE_MAX_AGE", vary=("Accept-Encoding",))
+def export_users():
+    format = request.args.get("format", "ndjson")
+    if format not in EXPORTERS:
+        return json_response({"error": f"Unknown format {format}"}, 400)
+    exporter, mimetype = EXPORTERS[format]
+
+    updated_at, now = db.session.execute(
+        db.select(Counter.updated_at, db.func.clock_timestamp()).where(
+            Counter.name == "users"
+        )
+    ).one()
+
+    # HTTP 日期只精确到秒：向上取整，并且只在这一秒已经过去之后才发送 Last-Modified，
+    # 否则同一秒之内之后的修改会得到相同的 Last-Modified，客户端会一直收到 304。
+    # If-None-Match 存在时忽略 If-Modified-Since（RFC 9110）
+    last_modified = updated_at.replace(microsecond=0)
+    if updated_at.microsecond:
+        last_modified += datetime.timedelta(seconds=1)
+    if last_modified > now:
+        last_modified = None
+
+    if (
+        not request.if_none_match
+        and request.if_modified_since
+        and updated_at < request.if_modified_since
+    ):
+        response = Response(status=304)
+        if last_modified:
+            response.last_modified = last_modified
+        return response
+
+    # 生成器在视图返回之后才执行，需要保留请求上下文（以及其中的数据库会话）
+    @stream_with_context
+    def generate():
+        conn = db.session.connection().connection.driver_connection
+        yield from exporter(conn)
+
+    chunks = generate()
+    headers = {"Content-Disposition": f"attachment; filename=users.{format}"}
+    if request.accept_encodings["gzip"] > 0:
+        chunks = gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    # 没有 Content-Length，服务器使用分块传输
+    response = Response(chunks, mimetype=mimetype, headers=headers)
+    # 不能赋值 None：werkzeug 会把它当作当前时间
+    if last_modified:
+        response.last_modified = last_modified
+
+    return response
+
+
+# 批量创建用户：POST /api/users:batch，请求体为 {"emails": [...]}
+def create_users_batch():
+    data = request.get_json(silent=True)
+    emails = data.get("emails") if isinstance(data, dict) else None
+    if not isinstance(emails, list) or not all(isinstance(e, str) for e in emails):
+        return json_response({"error": "emails must be a list of strings"}, 400)
+    if len(emails) > current_app.config["API_MAX_BATCH_SIZE"]:
+        return json_response({"error": "Too many emails in one batch"}, 413)
+
+    created, skipped = create_users(emails)
+
+    return json_response({"created": created, "skipped": skipped})
@@ -1,5 +1,9 @@
-from flask import Flask
-from application.models import User
+import os
+
+from flask import Flask, g, jsonify
+from sqlalchemy.pool import QueuePool
+from application.counters import get_count
+from application.http_cache import conditional, users_count_etag
 
 
 # 创建一个应用程序工厂，它接受一个字符串 config_name ，并将其转换为配置对象的名称
@@ -12,21 +16,76 @@ def create_app(config_name):
 
     app.config.from_object(config_module)
 
-    from application.models import db, migrate
+    from application.cache import cache
+    from application.models import db
 
-    # 导入，获取配置并初始化数据库和迁移对象
+    # 导入，获取配置并初始化数据库和缓存对象
     db.init_app(app)
-    migrate.init_app(app, db)
+    cache.init_app(app)
+
+    # 迁移只在命令行中使用（flask db ...），Flask-Migrate 和 Alembic 的导入较慢，
+    # 只在开启 DB_MIGRATIONS 时导入（manage.py 运行 flask 命令时会开启），
+    # gunicorn 等服务器中创建应用时不导入
+    if app.config["DB_MIGRATIONS"]:
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+
+    # 只读副本（需要配置 POSTGRES_REPLICAS）
+    from application import replicas
+
+    replicas.init_app(app, db)
+
+    # 按请求统计 SQL（需要开启 SQL_PROFILING）
+    from application import profiling
+
+    profiling.init_app(app, db)
+
+    # Prometheus 指标，通过 /metrics 暴露（需要开启 METRICS）
+    if app.config["METRICS"]:
+        from application import metrics
+
+        metrics.init_app(app, db)
+
+    # API 的视图在第一次请求时才导入
+    from application.urls import api_blueprint
+
+    app.register_blueprint(api_blueprint())
 
     # 快速检查服务器是否正常运行
     @app.route("/")
     def hello_world():
         return "Hello, World!"
 
-    # 导入模型 User 并统计其表中的记录数量
+    # 响应的内容只有用户数量，用它作为 ETag。读到的数量保存在 g 中供视图使用，
+    # 不需要再查询一次
+    def users_count_version():
+        g.num_users = get_count("users", app.config["USERS_COUNT_TTL"])
+        return users_count_etag(g.num_users)
+
+    # 从计数表读取用户数量（由触发器维护），而不是每次都对 users 表执行 count(*)。
+    # nginx 按 Cache-Control 对 /users 做微缓存
     @app.route("/users")
+    @conditional(users_count_version, max_age="USERS_CACHE_MAX_AGE")
     def users():
-        num_users = User.query.count()
-        return f"Number of users: {num_users}"
+        return f"Number of users: {g.num_users}"
+
+    # 当前 worker 进程的连接池状态，用于排查连接池耗尽
+    @app.route("/_pool")
+    def pool():
+        pool = db.engine.pool
+
+        # 使用 PgBouncer 时是 NullPool，不保留连接，也就没有这些统计
+        if not isinstance(pool, QueuePool):
+            return jsonify(pid=os.getpid(), pool=type(pool).__name__)
+
+        return jsonify(
+            pid=os.getpid(),
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            # 未创建溢出连接时 overflow() 为负数
+            overflow=max(pool.overflow(), 0),
+        )
 
     return app
@@ -0,0 +1,109 @@
+# ASGI 入口（GUNICORN_WORKER_CLASS=asgi，由 uvicorn worker 运行）：
+# 只读路由（如 /users）在事件循环中通过 psycopg 异步连接池直接读取数据库，
+# 等待 PostgreSQL 时不占用线程；其余请求通过 a2wsgi 交给 Flask 应用，在线程池中运行
+from a2wsgi import WSGIMiddleware
+from flask import Response
+from psycopg_pool import AsyncConnectionPool
+from sqlalchemy.engine import make_url
+from werkzeug.http import parse_etags
+
+from application.app import create_app
+from application.counters import get_count_async
+from application.http_cache import set_cache_control, users_count_etag
+
+
+# 由 SQLALCHEMY_DATABASE_URI 得到 psycopg 的连接字符串（去掉 +psycopg）
+def _conninfo(uri):
+    url = make_url(uri).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+# 把 Flask（werkzeug）的响应对象发送给 ASGI 服务器
+async def _send_response(send, response):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in response.headers.items()
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": response.get_data()})
+
+
+# 处理 lifespan：worker 启动时打开连接池（不建立连接），退出时关闭
+async def _lifespan(pool, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await pool.open(wait=True)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await pool.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+# 创建 ASGI 应用。异步路由不经过 Flask，因此也不会记录 Prometheus 指标和 SQL 统计
+def create_asgi_app(config_name):
+    flask_app = create_app(config_name)
+
+    # 运行 Flask 的线程数不超过 SQLAlchemy 连接池能提供的连接数
+    # （使用 PgBouncer 时 NullPool 不限制连接数，同样按配置的连接池大小限制）
+    pool_options = flask_app.config["POOL_OPTIONS"]
+    max_size = pool_options["pool_size"] + pool_options["max_overflow"]
+    recycle = pool_options["pool_recycle"]
+
+    wsgi = WSGIMiddleware(flask_app, workers=max_size)
+    # 异步路由只在计数器缓存过期时查询，只需要很少的连接：
+    # 连接在第一次使用时才打开（min_size=0），空闲一分钟后关闭，
+    # 不会让每个 worker 的连接数在 SQLAlchemy 连接池之外再翻一倍
+    pool = AsyncConnectionPool(
+        _conninfo(flask_app.config["SQLALCHEMY_DATABASE_URI"]),
+        min_size=0,
+        max_size=flask_app.config["ASYNC_POOL_MAX_SIZE"],
+        timeout=pool_options["pool_timeout"],
+        max_lifetime=recycle if recycle > 0 else 3600,
+        max_idle=60,
+        # 使用 PgBouncer 时关闭预备语句，与 SQLAlchemy 的连接相同
+        kwargs=flask_app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"],
+        open=False,
+    )
+
+    # 与 Flask 中的 /users 返回相同的内容、ETag 和 Cache-Control
+    async def users(scope):
+        num_users = await get_count_async(
+            pool, "users", flask_app.config["USERS_COUNT_TTL"]
+        )
+
+        etag = users_count_etag(num_users)
+        if_none_match = dict(scope["headers"]).get(b"if-none-match", b"")
+        if parse_etags(if_none_match.decode("latin-1")).contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(f"Number of users: {num_users}")
+        response.set_etag(etag, weak=True)
+        set_cache_control(response, flask_app.config["USERS_CACHE_MAX_AGE"])
+
+        return response
+
+    routes = {"/users": users}
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await _lifespan(pool, receive, send)
+        elif (
+            scope["type"] == "http"
+            and scope["method"] == "GET"
+            and scope["path"] in routes
+        ):
+            await _send_response(send, await routes[scope["path"]](scope))
+        else:
+            await wsgi(scope, receive, send)
+
+    app.flask_app = flask_app
+    app.pool = pool
+
+    return app
@@ -0,0 +1,54 @@
+# 使用 PostgreSQL COPY 批量写入用户，用于生成百万级的场景数据
+import csv
+import json
+import time
+
+from application.cache import invalidate_on_commit
+from application.models import db
+
+
+# 生成 n 个用户，邮箱按序号区分，从 start 开始编号
+def generate_users(n, start=0, domain="server.com"):
+    for i in range(start, start + n):
+        yield (f"user{i}@{domain}",)
+
+
+# 从带表头的 CSV 文件读取用户，需要包含 email 列
+def read_csv(path):
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield (row["email"],)
+
+
+# 从 JSONL 文件读取用户，每行一个包含 email 字段的 JSON 对象
+def read_jsonl(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield (json.loads(line)["email"],)
+
+
+# 通过 psycopg 3 的 cursor.copy() 将行流式写入 users 表，返回写入的行数。
+# rows 可以是任意可迭代对象（例如生成器），不会一次性加载到内存中
+def copy_users(rows):
+    start = time.perf_counter()
+    count = 0
+
+    # 使用当前会话连接底层的 psycopg 连接，COPY 不经过 ORM，但与会话处于同一个事务中
+    conn = db.session.connection().connection.driver_connection
+    with conn.cursor() as cursor:
+        with cursor.copy("COPY users (email) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+                count += 1
+        # 大量写入后更新统计信息，否则查询计划仍基于空表
+        cursor.execute("ANALYZE users")
+    invalidate_on_commit(db.session, "users")
+    db.session.commit()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Loaded {count} users in {elapsed:.2f}s ({count / elapsed:.0f} rows/s)"
+    )
+
+    return count
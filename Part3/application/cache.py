@@ -0,0 +1,276 @@
+# 应用级缓存，与 db 一样在 create_app 中初始化，后端由 CACHE_BACKEND 选择：
+#   lru：进程内的 LRU 缓存（带 TTL），每个进程一份，失效只影响当前进程，适合单进程的开发环境
+#   redis：任何使用 Redis 协议的服务，所有 worker 共享，失效对所有 worker 生效
+#   null：不缓存（测试环境）
+# @cached 缓存查询函数的结果；同一个进程中同一个键同时只计算一次（single-flight），
+# 其余调用者等待它的结果（最多 CACHE_LOCK_TIMEOUT 秒），避免缓存过期时大量请求同时访问数据库。
+# 每个缓存项可以带标签，invalidate(tag) 使带有该标签的所有缓存项失效。
+# Redis 不可用时记录错误，按没有缓存处理，直接执行查询
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import orjson
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 缓存中没有该键（缓存的值本身可能是 None）
+MISSING = object()
+
+
+class NullBackend:
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, ttl, tags=()):
+        pass
+
+    def invalidate(self, tag):
+        pass
+
+
+class LRUBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        # {键: (值, 过期时间, 标签)}，按最近使用的顺序排列
+        self._entries = OrderedDict()
+        # {标签: 键的集合}
+        self._tags = {}
+        # gthread worker 中多个线程同时访问
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return MISSING
+
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            # 超出容量时淘汰最久没有使用的
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tag):
+        with self._lock:
+            for key in self._tags.pop(tag, ()):
+                self._remove(key)
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+# 值用 orjson 序列化，因此只能缓存 JSON 类型（查询函数返回的 dict、list 等）。
+# 每个标签是一个集合，保存带有该标签的键，它的过期时间不短于其中任何一个键
+class RedisBackend:
+    def __init__(self, client, prefix):
+        import redis
+
+        self.client = client
+        self.prefix = prefix
+        self.errors = redis.RedisError
+
+    # timeout：连接和读写的超时（秒）。Redis 无响应时请求很快按缓存未命中处理，
+    # 而不是一直阻塞在套接字上
+    @classmethod
+    def from_url(cls, url, prefix, timeout):
+        import redis
+
+        client = redis.Redis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        return cls(client, prefix)
+
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except self.errors:
+            logger.exception("Cache get failed, computing %s without the cache", key)
+            return MISSING
+
+        if value is None:
+            return MISSING
+
+        return orjson.loads(value)
+
+    def set(self, key, value, ttl, tags=()):
+        key = self.prefix + key
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.set(key, orjson.dumps(value), ex=ttl)
+                for tag in tags:
+                    tag_key = f"{self.prefix}tag:{tag}"
+                    pipe.sadd(tag_key, key)
+                    # 新建的集合没有过期时间，GT 不会生效，所以先用 NX 设置
+                    pipe.expire(tag_key, ttl, nx=True)
+                    pipe.expire(tag_key, ttl, gt=True)
+                pipe.execute()
+        except self.errors:
+            logger.exception("Cache set failed for %s", key)
+
+    # 失败时旧的缓存项会一直保留到过期（最多 TTL 秒）
+    def invalidate(self, tag):
+        tag_key = f"{self.prefix}tag:{tag}"
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.smembers(tag_key)
+                pipe.delete(tag_key)
+                keys, _ = pipe.execute()
+
+            if keys:
+                self.client.delete(*keys)
+        except self.errors:
+            logger.exception("Cache invalidation failed for tag %s", tag)
+
+
+class Cache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config["CACHE_BACKEND"]
+        if backend == "lru":
+            backend = LRUBackend(app.config["CACHE_MAX_ENTRIES"])
+        elif backend == "redis":
+            backend = RedisBackend.from_url(
+                app.config["CACHE_REDIS_URL"],
+                app.config["CACHE_KEY_PREFIX"],
+                app.config["CACHE_REDIS_TIMEOUT"],
+            )
+        elif backend == "null":
+            backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown cache backend {backend}")
+
+        app.extensions["cache"] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions["cache"]
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None, tags=()):
+        if ttl is None:
+            ttl = current_app.config["CACHE_DEFAULT_TTL"]
+        self.backend.set(key, value, ttl, tags)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.invalidate(tag)
+
+
+cache = Cache()
+
+
+# 正在计算的键：{键: _Flight}
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+# 同一个键同时只有一个调用者执行 compute，其余调用者等待并得到相同的结果（或异常）。
+# 等待超过 timeout 秒（None 表示不限制）时不再等待，自己执行 compute，
+# 执行 compute 的调用者卡住时其余调用者不会一起卡住
+def single_flight(key, compute, timeout=None):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if not flight.done.wait(timeout):
+            return compute()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        flight.value = compute()
+        return flight.value
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+# 缓存函数的结果，键由函数名和参数的 repr 组成。ttl 为 None 时使用 CACHE_DEFAULT_TTL
+def cached(ttl=None, tags=()):
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f"{name}:{args!r}:{sorted(kwargs.items())!r}"
+
+            value = cache.get(key)
+            if value is not MISSING:
+                return value
+
+            def compute():
+                # 等待期间其他调用者可能已经写入了缓存
+                value = cache.get(key)
+                if value is MISSING:
+                    value = func(*args, **kwargs)
+                    cache.set(key, value, ttl, tags)
+                return value
+
+            return single_flight(
+                key, compute, current_app.config["CACHE_LOCK_TIMEOUT"]
+            )
+
+        return wrapper
+
+    return decorator
+
+
+# 在会话提交之后使 tags 失效。在提交之前失效的话，并发的请求可能在提交之前
+# 重新读取到旧的数据并写入缓存。
+# 提交之后失效仍然不能完全避免旧数据被写回缓存：在提交之前开始计算的请求可能在
+# 失效之后才写入它读到的旧值；使用只读副本时，延迟的副本在失效之后也可能返回旧数据。
+# 这些旧值最多保留 TTL 秒，所以带标签的缓存只用于允许短时间陈旧的数据
+def invalidate_on_commit(session, *tags):
+    session.info.setdefault("cache_invalidate", set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    tags = session.info.pop("cache_invalidate", None)
+    if tags and has_app_context():
+        cache.invalidate(*tags)
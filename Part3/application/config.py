@@ -1,16 +1,30 @@
 # 配置 Flask 应用程序。统一管理不同环境下的配置。
 import os
 
+from sqlalchemy.pool import NullPool
+
+from application.settings import Settings
+
+# 从环境变量读取配置并转换类型（manage.py 根据 config/*.json 设置这些环境变量），
+# 缺少必需的值或类型错误时在导入时抛出 ValueError
+settings = Settings.from_environ(os.environ)
+
 
 class Config(object):
     """基础环境"""
 
-    user = os.environ["POSTGRES_USER"]
-    password = os.environ["POSTGRES_PASSWORD"]
-    hostname = os.environ["POSTGRES_HOSTNAME"]
-    port = os.environ["POSTGRES_PORT"]
+    user = settings.POSTGRES_USER
+    password = settings.POSTGRES_PASSWORD
+    hostname = settings.POSTGRES_HOSTNAME
+    port = settings.POSTGRES_PORT
     # 将 Postgres 用于管理所有其他数据库的默认数据库，与我们的应用程序专用的数据库分离开来
-    database = os.environ["APPLICATION_DB"]
+    database = settings.APPLICATION_DB
+
+    # 通过 PgBouncer（事务池模式）连接主库，见 docker/production.yml 中的 pgbouncer 服务
+    PGBOUNCER = settings.PGBOUNCER
+    if PGBOUNCER:
+        hostname = settings.PGBOUNCER_HOSTNAME
+        port = settings.PGBOUNCER_PORT
 
     # 使用psycopg3
     SQLALCHEMY_DATABASE_URI = (
@@ -18,6 +32,100 @@ class Config(object):
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # 直接连接 PostgreSQL 时每个 gunicorn worker 各有一个连接池，参数来自 config/*.json
+    pool_options = {
+        "pool_size": settings.SQLALCHEMY_POOL_SIZE,
+        "max_overflow": settings.SQLALCHEMY_MAX_OVERFLOW,
+        # 等待空闲连接的最长时间（秒），超时抛出异常而不是无限排队
+        "pool_timeout": settings.SQLALCHEMY_POOL_TIMEOUT,
+        # 连接存活超过该秒数后重建，-1 表示不回收
+        "pool_recycle": settings.SQLALCHEMY_POOL_RECYCLE,
+        # 取出连接前先探测，PostgreSQL 重启后不会拿到失效的连接
+        "pool_pre_ping": settings.SQLALCHEMY_POOL_PRE_PING,
+        # 单条语句的最长执行时间（毫秒），0 表示不限制
+        "connect_args": {
+            "options": "-c statement_timeout={}".format(
+                settings.POSTGRES_STATEMENT_TIMEOUT
+            )
+        },
+    }
+    SQLALCHEMY_ENGINE_OPTIONS = pool_options
+    # 连接池参数总是可以通过 app.config 读取（使用 PgBouncer 时 SQLALCHEMY_ENGINE_OPTIONS
+    # 中没有这些参数），例如 asgi 按它限制运行 Flask 的线程数
+    POOL_OPTIONS = pool_options
+
+    # 使用 PgBouncer 时：
+    # - 连接由 PgBouncer 复用，应用端不保留连接（NullPool），否则每个 worker 的空闲连接
+    #   会一直占用 PgBouncer 的客户端连接
+    # - 同一个客户端连接上相邻的事务可能在不同的服务器连接上执行，
+    #   不能使用服务器端预备语句（psycopg 默认在同一语句执行 5 次后创建）
+    # - PgBouncer 不接受 options 启动参数，语句超时由 PgBouncer 的 query_timeout 控制
+    if PGBOUNCER:
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            "poolclass": NullPool,
+            "connect_args": {"prepare_threshold": None},
+        }
+
+    # ASGI 模式下异步路由（只读取计数器，结果按 TTL 缓存）的 psycopg 连接池的
+    # 最大连接数。连接按需打开，与上面的连接池一起计入每个 worker 的连接数
+    ASYNC_POOL_MAX_SIZE = settings.ASYNC_POOL_MAX_SIZE
+
+    # 只读副本，格式为 host:port,host:port（用户名、密码和数据库与主库相同），
+    # 每个副本一个 bind：replica_0、replica_1……
+    # 副本总是直接连接（不经过 PgBouncer），使用上面的连接池参数。
+    # Flask-SQLAlchemy 不会把 SQLALCHEMY_ENGINE_OPTIONS 应用到 bind，需要在 bind 中指定
+    SQLALCHEMY_BINDS = {}
+    for i, replica in enumerate(settings.POSTGRES_REPLICAS):
+        SQLALCHEMY_BINDS[f"replica_{i}"] = {
+            "url": f"postgresql+psycopg://{user}:{password}@{replica}/{database}",
+            **pool_options,
+        }
+    # 出错的副本在这么多秒内不再使用
+    REPLICA_RETRY_INTERVAL = settings.REPLICA_RETRY_INTERVAL
+    # 复制延迟超过这么多秒的副本暂时不用（0 表示不检查），每个副本每
+    # REPLICA_LAG_CHECK_INTERVAL 秒检查一次
+    REPLICA_MAX_LAG = settings.REPLICA_MAX_LAG
+    REPLICA_LAG_CHECK_INTERVAL = settings.REPLICA_LAG_CHECK_INTERVAL
+
+    # 注册 Flask-Migrate（flask db ...）。服务器中不需要，默认关闭
+    DB_MIGRATIONS = settings.DB_MIGRATIONS
+
+    # 在 /metrics 暴露 Prometheus 指标
+    METRICS = settings.METRICS
+
+    # 开启后每个响应都带有 Server-Timing 头，并可以通过 /_debug/queries 查看最近请求的 SQL 统计
+    SQL_PROFILING = settings.SQL_PROFILING
+    SQL_PROFILING_HISTORY = settings.SQL_PROFILING_HISTORY
+
+    # /users 返回的用户数量允许的最大陈旧时间（秒），0 表示每次都读取计数表
+    USERS_COUNT_TTL = settings.USERS_COUNT_TTL
+    # /users 响应允许 nginx 等共享缓存缓存的秒数（Cache-Control: max-age），
+    # 0 表示每次都要用 ETag 重新验证
+    USERS_CACHE_MAX_AGE = settings.USERS_CACHE_MAX_AGE
+
+    # /api/users/by-email 查找不存在的邮箱时，结果在进程内缓存的秒数，0 表示不缓存
+    USERS_MISSING_EMAIL_TTL = settings.USERS_MISSING_EMAIL_TTL
+
+    # 应用缓存：lru（进程内）、redis（所有 worker 共享）或 null（不缓存）
+    CACHE_BACKEND = settings.CACHE_BACKEND
+    CACHE_DEFAULT_TTL = settings.CACHE_DEFAULT_TTL
+    # lru 后端最多保存的缓存项数量
+    CACHE_MAX_ENTRIES = settings.CACHE_MAX_ENTRIES
+    CACHE_REDIS_URL = settings.CACHE_REDIS_URL
+    CACHE_KEY_PREFIX = settings.CACHE_KEY_PREFIX
+    # 连接和读写 Redis 的超时（秒），超时按缓存未命中处理
+    CACHE_REDIS_TIMEOUT = settings.CACHE_REDIS_TIMEOUT
+    # single-flight 中等待其他调用者计算结果的最长时间（秒），超时后自己计算
+    CACHE_LOCK_TIMEOUT = settings.CACHE_LOCK_TIMEOUT
+
+    # /api/users 每页的默认和最大用户数量
+    API_PAGE_SIZE = settings.API_PAGE_SIZE
+    API_MAX_PAGE_SIZE = settings.API_MAX_PAGE_SIZE
+    # /api/users 等只读接口的 Cache-Control: max-age（秒），0 表示每次都要用 ETag 重新验证
+    API_CACHE_MAX_AGE = settings.API_CACHE_MAX_AGE
+    # POST /api/users:batch 一次最多接受的邮箱数量
+    API_MAX_BATCH_SIZE = settings.API_MAX_BATCH_SIZE
+
 
 class ProductionConfig(Config):
     """生产环境"""
@@ -31,3 +139,7 @@ class TestingConfig(Config):
     """测试环境"""
 
     TESTING = True
+    USERS_COUNT_TTL = 0
+    USERS_MISSING_EMAIL_TTL = 0
+    # 每个测试结束时回滚，回滚不会使缓存失效
+    CACHE_BACKEND = "null"
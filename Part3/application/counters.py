@@ -0,0 +1,54 @@
+# 计数器：从计数表中读取（O(1)），并在进程内按 TTL 缓存，避免每个请求都访问数据库
+import time
+
+from application.models import db, Counter
+
+# 每个进程一份缓存：{计数器名称: (值, 读取时间)}
+_cache = {}
+
+
+# 返回未过期的缓存值，没有则返回 None
+def _cached(name, ttl, now):
+    cached = _cache.get(name)
+    if cached is not None and now - cached[1] < ttl:
+        return cached[0]
+
+    return None
+
+
+# 返回计数器的值，缓存的值最多比数据库旧 ttl 秒（ttl 为 0 时总是读取计数表）
+def get_count(name, ttl):
+    now = time.monotonic()
+
+    value = _cached(name, ttl, now)
+    if value is not None:
+        return value
+
+    value = db.session.execute(
+        db.select(Counter.value).where(Counter.name == name)
+    ).scalar_one()
+    _cache[name] = (value, now)
+
+    return value
+
+
+# get_count 的异步版本，通过 psycopg 异步连接池读取，与 get_count 共用缓存
+async def get_count_async(pool, name, ttl):
+    now = time.monotonic()
+
+    value = _cached(name, ttl, now)
+    if value is not None:
+        return value
+
+    async with pool.connection() as connection:
+        cursor = await connection.execute(
+            "SELECT value FROM counters WHERE name = %s", (name,)
+        )
+        (value,) = await cursor.fetchone()
+    _cache[name] = (value, now)
+
+    return value
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,60 @@
+# 流式导出 users 表：每次只在内存中保留一小块数据，与表的行数无关。
+# 导出函数接收 psycopg 连接，Flask 视图和 manage.py export 共用
+import zlib
+
+import orjson
+
+# 合并成约 64 KB 的块再输出，避免每一行都产生一个 HTTP chunk 或一次写入
+CHUNK_SIZE = 64 * 1024
+
+
+def _buffered(blocks):
+    buffer = bytearray()
+    for block in blocks:
+        buffer += block
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+
+# CSV 由 PostgreSQL 的 COPY ... TO STDOUT 直接生成
+def export_csv(conn):
+    with conn.cursor() as cursor:
+        with cursor.copy(
+            "COPY (SELECT id, email FROM users ORDER BY id) TO STDOUT (FORMAT csv, HEADER)"
+        ) as copy:
+            yield from _buffered(copy)
+
+
+# NDJSON 使用服务器端（命名）游标，每次从数据库取 batch_size 行。
+# 命名游标需要在事务中使用，连接不能处于 autocommit 模式
+def export_ndjson(conn, batch_size=10000):
+    def lines():
+        with conn.cursor(name="export_users") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute("SELECT id, email FROM users ORDER BY id")
+            for id, email in cursor:
+                yield orjson.dumps({"id": id, "email": email}) + b"\n"
+
+    yield from _buffered(lines())
+
+
+# 格式名称到 (导出函数, MIME 类型)
+EXPORTERS = {
+    "csv": (export_csv, "text/csv"),
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+}
+
+
+# 边导出边压缩为 gzip 格式
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 表示带 gzip 头部
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
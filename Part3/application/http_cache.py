@@ -0,0 +1,60 @@
+# HTTP 缓存：为只读视图加上弱 ETag、Cache-Control 和 Vary。
+# ETag 由廉价的“版本”计算（例如计数表中的行数和最后修改时间），而不是对响应体求哈希；
+# If-None-Match 匹配时在执行视图（以及其中代价较高的查询）之前直接返回 304
+import functools
+
+from flask import current_app, make_response, request
+
+from application.models import db, Counter
+
+
+# users 表的版本：行数和最后一次变化的时间，由计数表的触发器维护，按主键读取一行
+def users_version():
+    value, updated_at = db.session.execute(
+        db.select(Counter.value, Counter.updated_at).where(Counter.name == "users")
+    ).one()
+
+    return f"users-{value}-{updated_at.timestamp():.6f}"
+
+
+# /users 的 ETag：响应的内容只有用户数量
+def users_count_etag(num_users):
+    return f"users-count-{num_users}"
+
+
+# max_age 为 0 时允许缓存但每次都要重新验证（no-cache），否则允许共享缓存保存 max_age 秒
+def set_cache_control(response, max_age):
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+
+
+# version：返回当前版本字符串的函数，作为弱 ETag
+# max_age：配置项的名称，值为 Cache-Control 的 max-age（秒）
+# vary：响应随之变化的请求头
+def conditional(version, max_age, vary=()):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = version()
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                # 错误响应不缓存（视图自己返回的 304 除外）
+                if response.status_code not in (200, 304):
+                    return response
+
+            response.set_etag(etag, weak=True)
+            set_cache_control(response, current_app.config[max_age])
+            for header in vary:
+                response.vary.add(header)
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,113 @@
+# Prometheus 指标：按路由的请求延迟直方图、正在处理的请求数、连接池状态和进程内存，
+# 通过 /metrics 暴露。
+# gunicorn 多进程部署时设置 PROMETHEUS_MULTIPROC_DIR（必须在导入 prometheus_client 之前），
+# 每个 worker 把指标写入该目录下的 mmap 文件，/metrics 汇总所有 worker 的数据。
+# 已退出的 worker 由 gunicorn.conf.py 中的 child_exit 清理
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+# 指标在进程内只能创建一次，所有应用实例共用
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+# livesum：所有存活 worker 的值相加
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Open database connections held by the pool",
+    multiprocess_mode="livesum",
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Database connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+# liveall：每个存活的 worker 一条时间序列（带 pid 标签）
+RESIDENT_MEMORY = Gauge(
+    "worker_resident_memory_bytes",
+    "Resident memory of the worker process",
+    multiprocess_mode="liveall",
+)
+
+# 每个进程最多每隔这么多秒读取一次内存占用
+RESIDENT_MEMORY_INTERVAL = 1.0
+_resident_memory_updated = 0.0
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _update_resident_memory():
+    global _resident_memory_updated
+
+    now = time.monotonic()
+    if now - _resident_memory_updated < RESIDENT_MEMORY_INTERVAL:
+        return
+    _resident_memory_updated = now
+
+    with open("/proc/self/statm") as f:
+        RESIDENT_MEMORY.set(int(f.read().split()[1]) * PAGE_SIZE)
+
+
+def init_app(app, db):
+    if not app.config["METRICS"]:
+        return
+
+    # 通过连接池事件维护连接数（包括只读副本的连接池），每个 worker 写入自己的值
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        event.listen(engine, "connect", lambda *args: POOL_CONNECTIONS.inc())
+        event.listen(engine, "close", lambda *args: POOL_CONNECTIONS.dec())
+        event.listen(engine, "checkout", lambda *args: POOL_CHECKED_OUT.inc())
+        event.listen(engine, "checkin", lambda *args: POOL_CHECKED_OUT.dec())
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def observe_latency(response):
+        # 使用路由规则而不是实际路径作为标签，避免时间序列的数量随 URL 增长
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(
+            time.perf_counter() - g.metrics_start
+        )
+        _update_resident_memory()
+
+        return response
+
+    # 请求出错时 after_request 不会执行，在这里减少计数
+    @app.teardown_request
+    def finish_request(exc):
+        if "metrics_start" in g:
+            REQUESTS_IN_FLIGHT.dec()
+
+    @app.route("/metrics")
+    def metrics():
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
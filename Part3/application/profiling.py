@@ -0,0 +1,74 @@
+# 按请求统计 SQL：查询次数、总耗时和最慢的语句。
+# 结果写入响应头 Server-Timing，并保存在环形缓冲区中，通过 /_debug/queries 查看。
+# 只有 SQL_PROFILING 开启时才注册事件监听器和路由，关闭时没有任何额外开销
+import time
+from collections import deque
+
+from flask import g, has_app_context, jsonify, request
+from sqlalchemy import event
+
+
+def init_app(app, db):
+    if not app.config["SQL_PROFILING"]:
+        return
+
+    # 最近 SQL_PROFILING_HISTORY 个请求的统计
+    history = deque(maxlen=app.config["SQL_PROFILING_HISTORY"])
+
+    # 包括只读副本的 engine
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    # 用栈保存开始时间，同一个连接上的语句按顺序执行
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+
+        # 应用上下文之外（例如命令行）执行的语句不统计
+        if not has_app_context():
+            return
+
+        profile = g.setdefault(
+            "sql_profile", {"queries": 0, "seconds": 0.0, "slowest": None}
+        )
+        profile["queries"] += 1
+        profile["seconds"] += elapsed
+        if profile["slowest"] is None or elapsed > profile["slowest"][1]:
+            profile["slowest"] = (statement, elapsed)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    @app.after_request
+    def add_server_timing(response):
+        profile = g.pop("sql_profile", None)
+        if profile is None:
+            return response
+
+        statement, slowest = profile["slowest"]
+        total = profile["seconds"] * 1000
+        response.headers.add(
+            "Server-Timing", f'db;dur={total:.2f};desc="{profile["queries"]} queries"'
+        )
+        response.headers.add("Server-Timing", f"db-slowest;dur={slowest * 1000:.2f}")
+
+        history.append(
+            {
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "status": response.status_code,
+                "queries": profile["queries"],
+                "db_ms": round(total, 3),
+                "slowest": {"statement": statement, "ms": round(slowest * 1000, 3)},
+            }
+        )
+
+        return response
+
+    # 最近请求的 SQL 统计，最新的在前
+    @app.route("/_debug/queries")
+    def debug_queries():
+        return jsonify(list(reversed(history)))
@@ -0,0 +1,150 @@
+# 只读副本：SELECT 语句发送到 POSTGRES_REPLICAS 中的副本，其余语句发送到主库。
+# 每个会话（即每个请求）第一次读取时按轮询选择一个副本，之后的读取都使用这个副本，
+# 同一个请求中不会因为换到复制进度不同的副本而看到数据“倒退”。
+# 会话一旦在主库上写入（flush、INSERT/UPDATE/DELETE、直接使用 session.connection()），
+# 在它结束之前（即当前请求中）的所有语句都使用主库，保证读到自己的写入；
+# 先读后写（读取-修改-写入）的代码在读取之前调用 use_primary(session)。
+# 副本出错（连接失败、连接断开）或复制延迟超过 REPLICA_MAX_LAG 秒后，
+# 在 REPLICA_RETRY_INTERVAL 秒内不再使用；所有副本都不可用时读取主库
+import itertools
+import threading
+import time
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import Select
+
+# 副本的复制延迟（秒）：已经回放了收到的所有 WAL 时为 0，否则为距离最后回放的事务
+# 提交的时间。不是副本（pg_is_in_recovery() 为假）时为 NULL
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class ReplicaSet:
+    def __init__(self, engines, retry_interval, max_lag=0, lag_check_interval=5):
+        self.engines = engines
+        self.retry_interval = retry_interval
+        # 0 表示不检查复制延迟
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._order = itertools.cycle(range(len(engines)))
+        self._lock = threading.Lock()
+        # 每个副本在这个时间（time.monotonic()）之前被认为不可用
+        self._down_until = [0.0] * len(engines)
+        # 每个副本下一次检查复制延迟的时间
+        self._check_lag_at = [0.0] * len(engines)
+
+        for i, engine in enumerate(engines):
+            event.listen(engine, "handle_error", self._error_handler(i))
+
+    def _error_handler(self, i):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(i)
+
+        return handle_error
+
+    def mark_down(self, i):
+        self._down_until[i] = time.monotonic() + self.retry_interval
+
+    def lag(self, i):
+        with self.engines[i].connect() as conn:
+            return conn.execute(LAG_QUERY).scalar()
+
+    # 每个副本最多每 lag_check_interval 秒检查一次复制延迟（在请求中执行），
+    # 延迟过大或无法检查时标记为不可用
+    def _lag_ok(self, i, now):
+        if not self.max_lag or now < self._check_lag_at[i]:
+            return True
+        self._check_lag_at[i] = now + self.lag_check_interval
+
+        try:
+            lag = self.lag(i)
+        except SQLAlchemyError:
+            self.mark_down(i)
+            return False
+
+        if lag is not None and lag > self.max_lag:
+            self.mark_down(i)
+            return False
+
+        return True
+
+    # 按轮询返回下一个可用的副本，没有可用的副本时返回 None
+    def choose(self):
+        for _ in range(len(self.engines)):
+            now = time.monotonic()
+            with self._lock:
+                i = next(self._order)
+                if self._down_until[i] > now:
+                    continue
+            if self._lag_ok(i, now):
+                return self.engines[i]
+
+        return None
+
+    def is_up(self, engine):
+        return self._down_until[self.engines.index(engine)] <= time.monotonic()
+
+
+# 普通的 SELECT（不带 FOR UPDATE）才可以发送到副本
+def _is_read(clause):
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+
+# 之后的语句都发送到主库，用于先读后写的代码：读取也必须在主库上进行，
+# 否则读到的可能是副本上的旧数据
+def use_primary(session):
+    session.info["primary"] = True
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replicas = current_app.extensions.get("replicas")
+        if replicas is not None and bind is None and not self.info.get("primary"):
+            if _is_read(clause):
+                engine = self._replica(replicas)
+                if engine is not None:
+                    return engine
+            else:
+                self.info["primary"] = True
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    # 会话使用的副本：第一次读取时选择，之后固定不变。副本变为不可用时改用主库
+    # （主库的数据不会比副本旧），同样固定不变
+    def _replica(self, replicas):
+        engine = self.info.get("replica")
+        if engine is None:
+            engine = self.info["replica"] = replicas.choose()
+            if engine is None:
+                self.info["primary"] = True
+        elif not replicas.is_up(engine):
+            self.info["primary"] = True
+            engine = None
+
+        return engine
+
+
+def init_app(app, db):
+    keys = [key for key in app.config["SQLALCHEMY_BINDS"] if key.startswith("replica")]
+    if not keys:
+        return
+
+    with app.app_context():
+        engines = [db.engines[key] for key in keys]
+
+    app.extensions["replicas"] = ReplicaSet(
+        engines,
+        app.config["REPLICA_RETRY_INTERVAL"],
+        app.config["REPLICA_MAX_LAG"],
+        app.config["REPLICA_LAG_CHECK_INTERVAL"],
+    )
@@ -0,0 +1,90 @@
+# 对 users 表的查询和写入，视图函数只负责解析请求和序列化结果
+import time
+from collections import OrderedDict
+
+from sqlalchemy.dialects.postgresql import insert
+
+from application.cache import cached, invalidate_on_commit
+from application.models import db, User
+
+# 每条 INSERT 语句最多插入的行数（PostgreSQL 单条语句最多 65535 个参数）
+INSERT_BATCH_SIZE = 10000
+
+# 最近查找过但不存在的邮箱（小写）及其过期时间，每个进程一份，最多保留
+# MISSING_EMAILS_MAX_SIZE 个，超出时淘汰最早加入的
+MISSING_EMAILS_MAX_SIZE = 100000
+_missing_emails = OrderedDict()
+
+
+# 键集分页：返回 id 大于 after_id 的前 limit 个用户（只查询需要的列，不构造 ORM 对象）。
+# 使用主键索引直接定位，翻到第几页的代价都与第一页相同。
+# 结果缓存在应用缓存中，用户变化时失效
+@cached(tags=("users",))
+def list_users(after_id, limit):
+    rows = db.session.execute(
+        db.select(User.id, User.email)
+        .where(User.id > after_id)
+        .order_by(User.id)
+        .limit(limit)
+    )
+
+    return [{"id": id, "email": email} for id, email in rows]
+
+
+# 批量创建用户：每批只执行一条 INSERT ... ON CONFLICT DO NOTHING RETURNING，
+# 已存在的邮箱（不区分大小写）被跳过而不是抛出 IntegrityError。
+# 返回 (created, skipped)：新建的用户 [{"id", "email"}] 和被跳过的邮箱，均保持输入顺序
+def create_users(emails):
+    # 去掉重复的邮箱，保持原有顺序
+    emails = list(dict.fromkeys(emails))
+
+    ids = {}
+    for start in range(0, len(emails), INSERT_BATCH_SIZE):
+        batch = emails[start : start + INSERT_BATCH_SIZE]
+        rows = db.session.execute(
+            insert(User)
+            .values([{"email": email} for email in batch])
+            # 不指定冲突目标，email 和 lower(email) 两个唯一索引上的冲突都会被跳过
+            .on_conflict_do_nothing()
+            .returning(User.id, User.email)
+        )
+        ids.update((email, id) for id, email in rows)
+    invalidate_on_commit(db.session, "users")
+    db.session.commit()
+
+    # 无论是新建的还是已存在而被跳过的，这些邮箱现在都存在
+    for email in emails:
+        _missing_emails.pop(email.lower(), None)
+
+    created = [{"id": ids[email], "email": email} for email in emails if email in ids]
+    skipped = [email for email in emails if email not in ids]
+
+    return created, skipped
+
+
+# 不区分大小写地查找用户，使用 lower(email) 索引。找不到时返回 None，
+# 并在 missing_ttl 秒内直接返回 None 而不再查询数据库（0 表示不缓存）
+def find_user_by_email(email, missing_ttl):
+    key = email.lower()
+    now = time.monotonic()
+
+    expires = _missing_emails.get(key)
+    if expires is not None:
+        if expires > now:
+            return None
+        del _missing_emails[key]
+
+    row = db.session.execute(
+        db.select(User.id, User.email).where(
+            db.func.lower(User.email) == db.func.lower(email)
+        )
+    ).first()
+
+    if row is None:
+        if missing_ttl > 0:
+            _missing_emails[key] = now + missing_ttl
+            if len(_missing_emails) > MISSING_EMAILS_MAX_SIZE:
+                _missing_emails.popitem(last=False)
+        return None
+
+    return {"id": row.id, "email": row.email}
@@ -0,0 +1,204 @@
+# 类型化的配置，manage.py 和 application.config 共用。
+# manage.py 按层读取配置文件（后面的覆盖前面的），写入环境变量后再启动应用或 docker compose：
+#   config/base.json：所有环境共用的值（可选）
+#   config/<name>.json：该环境的配置
+#   config/<name>.local.json：本机的覆盖，不提交到仓库（可选）
+# 已经存在的环境变量优先于配置文件。读取的结果按文件修改时间缓存，
+# 同一个进程中重复调用时，文件没有变化就不会重新读取和解析。
+# manage.py 用校验过的 Settings 生成写入环境变量的值（Settings.environ()），
+# 应用（application.config）从环境变量得到同一个 Settings：同一个进程中
+# Settings.from_environ 按这些值缓存，不会再解析一次
+import dataclasses
+import json
+import os
+
+CONFIG_PATH = "config"
+
+
+def _parse_bool(value):
+    value = value.lower()
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+
+    raise ValueError(value)
+
+
+# host:port,host:port
+def _parse_list(value):
+    return tuple(item for item in value.split(",") if item)
+
+
+# PARSERS 的逆操作，用于写入环境变量
+def _format(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, tuple):
+        return ",".join(value)
+
+    return str(value)
+
+
+PARSERS = {
+    bool: _parse_bool,
+    int: int,
+    float: float,
+    str: str,
+    tuple: _parse_list,
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    # 主库（必需）
+    POSTGRES_USER: str
+    POSTGRES_PASSWORD: str
+    POSTGRES_HOSTNAME: str
+    POSTGRES_PORT: int
+    APPLICATION_DB: str
+
+    PGBOUNCER: bool = False
+    PGBOUNCER_HOSTNAME: str = "pgbouncer"
+    PGBOUNCER_PORT: int = 6432
+
+    POSTGRES_REPLICAS: tuple = ()
+    REPLICA_RETRY_INTERVAL: float = 10
+    REPLICA_MAX_LAG: float = 0
+    REPLICA_LAG_CHECK_INTERVAL: float = 5
+
+    SQLALCHEMY_POOL_SIZE: int = 5
+    SQLALCHEMY_MAX_OVERFLOW: int = 10
+    SQLALCHEMY_POOL_TIMEOUT: float = 30
+    SQLALCHEMY_POOL_RECYCLE: int = -1
+    SQLALCHEMY_POOL_PRE_PING: bool = False
+    POSTGRES_STATEMENT_TIMEOUT: int = 0
+    ASYNC_POOL_MAX_SIZE: int = 2
+
+    DB_MIGRATIONS: bool = False
+
+    METRICS: bool = True
+    SQL_PROFILING: bool = False
+    SQL_PROFILING_HISTORY: int = 100
+
+    USERS_COUNT_TTL: float = 5
+    USERS_CACHE_MAX_AGE: int = 1
+    USERS_MISSING_EMAIL_TTL: float = 5
+
+    CACHE_BACKEND: str = "lru"
+    CACHE_DEFAULT_TTL: int = 30
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_KEY_PREFIX: str = "application:"
+    CACHE_REDIS_TIMEOUT: float = 0.1
+    CACHE_LOCK_TIMEOUT: float = 10
+
+    API_PAGE_SIZE: int = 100
+    API_MAX_PAGE_SIZE: int = 1000
+    API_CACHE_MAX_AGE: int = 0
+    API_MAX_BATCH_SIZE: int = 10000
+
+    # 从环境变量（或任何 {名称: 字符串} 的映射）创建，缺少必需的值或类型错误时
+    # 抛出 ValueError，列出所有的问题。结果按 Settings 字段的原始字符串缓存，
+    # 也按 environ() 的结果缓存，manage.py 写入环境变量后应用不会再解析一次
+    @classmethod
+    def from_environ(cls, environ):
+        raw = _raw(environ)
+        settings = _instances.get(raw)
+        if settings is not None:
+            return settings
+
+        values, errors = _parse(environ)
+
+        missing = [
+            field.name
+            for field in dataclasses.fields(cls)
+            if field.default is dataclasses.MISSING and field.name not in values
+        ]
+        if missing:
+            errors.append(f"{', '.join(missing)} must be set")
+
+        if errors:
+            raise ValueError(f"Invalid settings: {'; '.join(errors)}")
+
+        settings = cls(**values)
+        _instances[raw] = settings
+        _instances[_raw(settings.environ())] = settings
+        return settings
+
+    # 所有字段（包括默认值）转换为环境变量的字符串，from_environ 可以还原
+    def environ(self):
+        return {name: _format(getattr(self, name)) for name in FIELDS}
+
+
+FIELDS = {field.name: field for field in dataclasses.fields(Settings)}
+
+# {Settings 字段的原始字符串: Settings}
+_instances = {}
+
+
+def _raw(environ):
+    return tuple((name, environ[name]) for name in FIELDS if name in environ)
+
+
+# 转换 environ 中 Settings 的字段，返回 ({名称: 值}, 错误信息列表)。
+# 其他变量（FLASK_DEBUG、GUNICORN_* 等）不做处理；除字符串以外，空值视为没有设置，
+# 因为 docker compose 会把没有设置的变量替换为空字符串
+def _parse(environ):
+    values = {}
+    errors = []
+    for name, field in FIELDS.items():
+        value = environ.get(name)
+        if value is None or (value == "" and field.type is not str):
+            continue
+
+        try:
+            values[name] = PARSERS[field.type](value)
+        except ValueError:
+            errors.append(f"{name}={value!r} is not a valid {field.type.__name__}")
+
+    return values, errors
+
+
+# {(目录, 名称): (各层文件的修改时间, 合并后的值)}
+_cache = {}
+
+
+def _mtime(filename, required=False):
+    try:
+        return os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        if required:
+            raise
+        return None
+
+
+# 读取配置 name 的各层文件，返回合并后的 {名称: 字符串}。
+# 只校验出现在文件中的值的类型，必需的值可能在之后才设置（例如场景的 POSTGRES_PORT）
+def load_files(name, path=CONFIG_PATH):
+    layers = [
+        os.path.join(path, "base.json"),
+        os.path.join(path, f"{name}.json"),
+        os.path.join(path, f"{name}.local.json"),
+    ]
+    mtimes = tuple(
+        _mtime(filename, required=filename == layers[1]) for filename in layers
+    )
+
+    cached = _cache.get((path, name))
+    if cached is not None and cached[0] == mtimes:
+        return cached[1]
+
+    values = {}
+    for filename, mtime in zip(layers, mtimes):
+        if mtime is None:
+            continue
+        with open(filename) as f:
+            values.update((item["name"], str(item["value"])) for item in json.load(f))
+
+    _, errors = _parse(values)
+    if errors:
+        raise ValueError(f"Invalid settings in {path}/{name}: {'; '.join(errors)}")
+
+    _cache[(path, name)] = (mtimes, values)
+    return values
@@ -0,0 +1,39 @@
+# API 的 URL 规则。视图通过 LazyView 按名称引用，application.api（以及 orjson、
+# 导出和服务层）在第一次请求 API 时才导入，不影响 worker 启动和 / 等其他路由
+from flask import Blueprint
+from werkzeug.utils import cached_property, import_string
+
+
+class LazyView:
+    def __init__(self, import_name):
+        self.__module__, self.__name__ = import_name.rsplit(".", 1)
+        self.import_name = import_name
+
+    @cached_property
+    def view(self):
+        return import_string(self.import_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs)
+
+
+# (规则, 视图函数名, 方法)，端点名与视图函数名相同
+API_ROUTES = [
+    ("/users", "users", ["GET"]),
+    ("/users/by-email", "user_by_email", ["GET"]),
+    ("/users/export", "export_users", ["GET"]),
+    ("/users:batch", "create_users_batch", ["POST"]),
+]
+
+
+def api_blueprint():
+    api = Blueprint("api", __name__, url_prefix="/api")
+    for rule, name, methods in API_ROUTES:
+        api.add_url_rule(
+            rule,
+            endpoint=name,
+            view_func=LazyView(f"application.api.{name}"),
+            methods=methods,
+        )
+
+    return api
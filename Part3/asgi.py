@@ -0,0 +1,7 @@
+# ASGI 入口，与 wsgi.py 对应。GUNICORN_WORKER_CLASS=asgi 时由 gunicorn.conf.py 加载，
+# 使用 uvicorn worker 运行
+import os
+
+from application.asgi import create_asgi_app
+
+app = create_asgi_app(os.environ["FLASK_CONFIG"])
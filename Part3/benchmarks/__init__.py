@@ -0,0 +1 @@
+# 基准测试，使用 python -m benchmarks.<name> 运行
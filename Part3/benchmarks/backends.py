@@ -0,0 +1,42 @@
+# 负载测试期间定期统计应用数据库上的 PostgreSQL 后端连接数（pg_stat_activity），
+# 用来比较直连和通过 PgBouncer 连接时数据库需要承担的连接数
+import threading
+
+QUERY = (
+    "SELECT count(*) FROM pg_stat_activity "
+    "WHERE datname = %s AND pid <> pg_backend_pid()"
+)
+
+
+class BackendSampler:
+    def __init__(self, connect, database, interval=0.2):
+        self.connect = connect
+        self.database = database
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        with self.connect(autocommit=True) as conn:
+            while not self._stop.is_set():
+                (count,) = conn.execute(QUERY, (self.database,)).fetchone()
+                self.samples.append(count)
+                self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        if not self.samples:
+            return {"max": None, "mean": None}
+
+        return {
+            "max": max(self.samples),
+            "mean": round(sum(self.samples) / len(self.samples), 1),
+        }
@@ -0,0 +1,74 @@
+# 基准测试：不区分大小写的邮箱查找（lower(email) 索引 + 进程内的“不存在”缓存）
+# 运行：python -m benchmarks.email_lookup --config development --users 10000000
+# 数据库中 @benchmark.local 的用户不足 --users 个时会先用 COPY 补足
+import os
+import random
+import statistics
+import time
+
+import click
+
+from manage import configure_app
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[int(len(timings) * 0.99)]
+    print(
+        f"{name:<24} mean {statistics.mean(timings) * 1000:7.3f} ms  "
+        f"p50 {p50 * 1000:7.3f} ms  p99 {p99 * 1000:7.3f} ms"
+    )
+
+
+@click.command()
+@click.option("--config", default="development", help="Configuration to load")
+@click.option("--users", default=10_000_000, help="Number of users in the table")
+@click.option("--lookups", default=10_000, help="Number of lookups per case")
+def main(config, users, lookups):
+    configure_app(config)
+
+    # 配置加载之后才能导入应用
+    from application.app import create_app
+    from application.models import db
+    from application.services import find_user_by_email
+    from benchmarks.seed import DOMAIN, ensure_users
+
+    app = create_app(os.environ["FLASK_CONFIG"])
+
+    with app.app_context():
+        ensure_users(users)
+
+        email = f"USER{random.randrange(users)}@{DOMAIN.upper()}"
+        plan = db.session.execute(
+            db.text(
+                "EXPLAIN (ANALYZE, BUFFERS) SELECT id, email FROM users "
+                "WHERE lower(email) = lower(:email)"
+            ),
+            {"email": email},
+        ).scalars()
+        print("\n".join(plan))
+        print()
+
+        def run(emails, missing_ttl):
+            timings = []
+            for email in emails:
+                start = time.perf_counter()
+                find_user_by_email(email, missing_ttl)
+                timings.append(time.perf_counter() - start)
+            return timings
+
+        found = [
+            f"User{random.randrange(users)}@{DOMAIN.title()}" for _ in range(lookups)
+        ]
+        missing = [f"missing{i}@{DOMAIN}" for i in range(lookups)]
+
+        report("found", run(found, 0))
+        report("missing", run(missing, 0))
+        # 第一轮填充缓存，第二轮全部命中
+        run(missing, 60)
+        report("missing (cached)", run(missing, 60))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# 基准测试：冷启动。每次运行启动一个新的 Python 进程（python -X importtime），
+# 测量 import wsgi（导入模块并创建应用）的时间，以及之后第一次请求各个路径的时间
+# （包括按需导入的模块），并按顶层包汇总导入时间，找出导入最慢的依赖
+# 运行：python -m benchmarks.importtime --config development --runs 10
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+import click
+
+from benchmarks import results
+from manage import configure_app
+
+PATHS = ["/", "/users", "/api/users?limit=1"]
+
+# 在子进程中运行，输出 JSON：{"ready": 秒, "paths": {路径: 秒}}
+PROBE = """
+import json, sys, time
+
+start = time.perf_counter()
+import wsgi
+
+ready = time.perf_counter() - start
+client = wsgi.app.test_client()
+paths = {}
+for path in sys.argv[1:]:
+    start = time.perf_counter()
+    response = client.get(path)
+    paths[path] = time.perf_counter() - start
+    assert response.status_code == 200, (path, response.status_code)
+
+print(json.dumps({"ready": ready, "paths": paths}))
+"""
+
+
+# 解析 -X importtime 的输出，返回 {顶层包: 自身导入时间（微秒）}
+def parse_importtime(stderr):
+    packages = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # 表头
+            continue
+        packages[name.strip().split(".")[0]] += int(self_us)
+
+    return packages
+
+
+def run_once(paths):
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, *paths],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise click.ClickException(process.stderr.strip().splitlines()[-1])
+
+    return json.loads(process.stdout), parse_importtime(process.stderr)
+
+
+@click.command()
+@click.option("--config", default="development", help="Configuration to load")
+@click.option("--runs", default=10, help="Number of fresh processes")
+@click.option("--top", default=10, help="Number of packages to show")
+@click.option("--path", "paths", multiple=True, help="Paths to request (repeatable)")
+@click.option("--baseline", type=click.Path(exists=True), help="Result to compare")
+def main(config, runs, top, paths, baseline):
+    configure_app(config)
+    paths = list(paths) or PATHS
+
+    samples = [run_once(paths) for _ in range(runs)]
+
+    # 各项取中位数（毫秒）
+    ready = statistics.median(s["ready"] for s, _ in samples) * 1000
+    first = {
+        path: round(statistics.median(s["paths"][path] for s, _ in samples) * 1000, 2)
+        for path in paths
+    }
+    packages = defaultdict(list)
+    for _, imported in samples:
+        for name, us in imported.items():
+            packages[name].append(us)
+    packages = {
+        name: round(statistics.median(us) / 1000, 2)
+        for name, us in packages.items()
+        if len(us) == runs
+    }
+    packages = dict(sorted(packages.items(), key=lambda p: p[1], reverse=True))
+
+    base = results.load(baseline) if baseline else {}
+
+    def vs_baseline(value, key, path=None):
+        old = base.get(key)
+        if path is not None and old is not None:
+            old = old.get(path)
+        return f"  ({results.change(value, old)})" if old else ""
+
+    print(f"import wsgi + create_app: {ready:8.2f} ms{vs_baseline(ready, 'ready')}")
+    for path, ms in first.items():
+        print(f"first {path:<35} {ms:8.2f} ms{vs_baseline(ms, 'first', path)}")
+    print()
+    print(f"{'package':<30} {'self import ms':>15}")
+    for name, ms in list(packages.items())[:top]:
+        print(f"{name:<30} {ms:>15}")
+
+    filename = results.save(
+        {
+            "benchmark": "importtime",
+            "config": config,
+            "runs": runs,
+            "ready": round(ready, 2),
+            "first": first,
+            "packages": packages,
+        }
+    )
+    print(f"\nSaved {filename}")
+
+
+if __name__ == "__main__":
+    main()
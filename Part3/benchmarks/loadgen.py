@@ -0,0 +1,118 @@
+# 异步 HTTP 负载生成器：concurrency 个并发连接在 duration 秒内轮流请求 paths，
+# 记录每个请求的延迟。直接使用 asyncio 流实现 HTTP/1.1 客户端，
+# 本身的开销足够小，不会成为瓶颈
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+class HTTPError(Exception):
+    pass
+
+
+# 读取一个响应，返回 (状态码, 连接是否可以复用)
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise HTTPError("Connection closed by the server")
+    version, status = status_line.split(b" ", 2)[:2]
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    status = int(status)
+    # 1xx、204 和 304 响应没有响应体（即使带有 Content-Length）
+    if status < 200 or status in (204, 304):
+        pass
+    elif b"content-length" in headers:
+        await reader.readexactly(int(headers[b"content-length"]))
+    elif headers.get(b"transfer-encoding") == b"chunked":
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.read()
+        return status, False
+
+    keep_alive = version == b"HTTP/1.1" and headers.get(b"connection") != b"close"
+    return status, keep_alive
+
+
+async def _client(host, port, paths, offset, deadline, results):
+    reader = writer = None
+    i = offset
+
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+
+        # 连接不能复用时（例如 gunicorn 的 sync worker）建立连接的时间也计入延迟
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            status, keep_alive = await _read_response(reader)
+        except (OSError, HTTPError, ValueError, asyncio.IncompleteReadError):
+            status, keep_alive = None, False
+        elapsed = time.perf_counter() - start
+
+        if status is not None and status < 500:
+            results[path]["latencies"].append(elapsed)
+        else:
+            results[path]["errors"] += 1
+
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+# 运行负载，返回 {path: {"latencies": [...], "errors": n}} 和实际运行的秒数
+async def run_load(base_url, paths, concurrency, duration):
+    url = urlsplit(base_url)
+    port = url.port or 80
+    results = {path: {"latencies": [], "errors": 0} for path in paths}
+
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(
+        *(
+            _client(url.hostname, port, paths, i, deadline, results)
+            for i in range(concurrency)
+        )
+    )
+
+    return results, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+# 每个路径的吞吐量和延迟分位数（毫秒）
+def summarize(results, elapsed):
+    summary = {}
+    for path, result in results.items():
+        latencies = sorted(result["latencies"])
+        summary[path] = {
+            "requests": len(latencies),
+            "errors": result["errors"],
+            "rps": round(len(latencies) / elapsed, 1),
+            **{
+                name: round(percentile(latencies, fraction) * 1000, 3)
+                if latencies
+                else None
+                for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+            },
+        }
+
+    return summary
@@ -0,0 +1,68 @@
+# 保存、输出和比较基准测试结果。结果保存为 JSON 文件，
+# 文件名包含时间和 git 提交，便于比较不同提交之间的差异
+import json
+import os
+import subprocess
+import time
+
+RESULTS_PATH = os.path.join("benchmarks", "results")
+
+
+def git_commit():
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return output.decode("utf-8").strip()
+
+
+def save(run):
+    commit = git_commit()
+    run = {"commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **run}
+
+    os.makedirs(RESULTS_PATH, exist_ok=True)
+    filename = os.path.join(
+        RESULTS_PATH, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    )
+    with open(filename, "w") as f:
+        json.dump(run, f, indent=2)
+
+    return filename
+
+
+def load(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def change(value, baseline):
+    if value is None or not baseline:
+        return ""
+    return f"{(value - baseline) / baseline * 100:+.1f}%"
+
+
+# 输出每个路径的结果；给出 baseline 时同时输出相对 baseline 的变化
+def print_summary(summary, baseline=None):
+    baseline = baseline or {}
+    print(
+        f"{'path':<45} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'errors':>7}"
+    )
+    for path, result in summary.items():
+        # 只有失败请求的路径没有延迟分位数（None）
+        rps, p50, p95, p99 = (
+            "-" if result[key] is None else result[key]
+            for key in ("rps", "p50", "p95", "p99")
+        )
+        print(f"{path:<45} {rps:>9} {p50:>9} {p95:>9} {p99:>9} {result['errors']:>7}")
+        if path in baseline:
+            base = baseline[path]
+            print(
+                f"{'  vs baseline':<45} {change(result['rps'], base['rps']):>9} "
+                f"{change(result['p50'], base['p50']):>9} "
+                f"{change(result['p95'], base['p95']):>9} "
+                f"{change(result['p99'], base['p99']):>9}"
+            )
@@ -0,0 +1,42 @@
+# 为基准测试准备数据：保证数据库中有 n 个 @benchmark.local 的用户，不足时用 COPY 补足
+# 运行：python -m benchmarks.seed 100000（使用环境变量中的配置，见 manage.py bench）
+import os
+
+import click
+
+from application.bulk import copy_users, generate_users
+from application.models import db
+
+DOMAIN = "benchmark.local"
+
+
+def benchmark_email(i):
+    return f"user{i}@{DOMAIN}"
+
+
+# 需要在应用上下文中调用
+def ensure_users(n):
+    existing = db.session.execute(
+        db.text("SELECT count(*) FROM users WHERE email LIKE :pattern"),
+        {"pattern": f"%@{DOMAIN}"},
+    ).scalar_one()
+
+    if existing < n:
+        copy_users(generate_users(n - existing, existing, DOMAIN))
+
+    # 更新统计信息和可见性映射，Index Only Scan 才不需要回表
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM ANALYZE users")
+
+
+@click.command()
+@click.argument("n", type=int)
+def main(n):
+    from application.app import create_app
+
+    with create_app(os.environ["FLASK_CONFIG"]).app_context():
+        ensure_users(n)
+
+
+if __name__ == "__main__":
+    main()
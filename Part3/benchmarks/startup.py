@@ -0,0 +1,94 @@
+# 基准测试：gunicorn 在 preload_app 开启和关闭时的启动时间和每个 worker 的内存占用
+# 运行：python -m benchmarks.startup --config development --workers 4
+# 启动时间：从启动 gunicorn 到所有 worker 都响应过 /_pool 为止；
+# 内存：每个 worker 的 PSS（共享页面按进程数分摊）和 USS（只属于该进程的页面）
+import json
+import os
+import subprocess
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from manage import configure_app
+
+BIND = "127.0.0.1:8002"
+
+
+def _get_pid():
+    try:
+        with urllib.request.urlopen(f"http://{BIND}/_pool", timeout=1) as response:
+            return json.load(response)["pid"]
+    except OSError:
+        return None
+
+
+# 并发请求 /_pool，直到看到 workers 个不同的 pid
+def wait_for_workers(workers, timeout=60):
+    pids = set()
+    deadline = time.monotonic() + timeout
+    with ThreadPoolExecutor(workers * 2) as executor:
+        while len(pids) < workers:
+            if time.monotonic() > deadline:
+                raise click.ClickException(f"only {len(pids)} workers responded")
+            pids.update(pid for pid in executor.map(lambda _: _get_pid(), range(64)))
+            pids.discard(None)
+
+    return pids
+
+
+# 从 /proc/<pid>/smaps_rollup 读取 PSS 和 USS（KiB）
+def memory(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+
+    uss = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values.get("Pss", 0), uss
+
+
+def measure(preload, workers):
+    env = {
+        **os.environ,
+        "GUNICORN_PRELOAD": "1" if preload else "0",
+        "GUNICORN_WORKERS": str(workers),
+    }
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py", "-b", BIND],
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        pids = wait_for_workers(workers)
+        startup = time.perf_counter() - start
+        usage = [memory(pid) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait()
+
+    pss = sum(u[0] for u in usage) / len(usage) / 1024
+    uss = sum(u[1] for u in usage) / len(usage) / 1024
+    print(
+        f"preload {'on ' if preload else 'off'}  startup {startup:6.2f} s  "
+        f"PSS/worker {pss:7.1f} MiB  USS/worker {uss:7.1f} MiB"
+    )
+
+
+@click.command()
+@click.option("--config", default="development", help="Configuration to load")
+@click.option("--workers", default=4, help="Number of gunicorn workers")
+def main(config, workers):
+    configure_app(config)
+
+    measure(False, workers)
+    measure(True, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+#!/bin/bash
+# 允许副本（docker/testing.yml 中的 replica 服务）通过流复制连接主库。
+# 由 postgres 镜像在初始化数据库时执行
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
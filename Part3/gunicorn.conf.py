@@ -0,0 +1,112 @@
+# gunicorn 配置，docker/production.yml 通过 gunicorn -c gunicorn.conf.py 加载
+import glob
+import math
+import os
+
+# worker 类型来自 config/*.json 中的 GUNICORN_WORKER_CLASS：
+#   sync：每个 worker 同时只处理一个请求（默认）
+#   gthread：每个 worker 有 GUNICORN_THREADS 个线程，等待 PostgreSQL 时可以处理其他请求
+#   asgi：uvicorn worker 运行 asgi:app，/users 等只读路由使用异步连接池
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "asgi": "uvicorn.workers.UvicornWorker",
+}
+mode = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+worker_class = WORKER_CLASSES[mode]
+wsgi_app = "asgi:app" if mode == "asgi" else "wsgi:app"
+
+# 容器可以使用的 CPU 数量：取 CPU 亲和性和 cgroup 配额（v2 的 cpu.max 或
+# v1 的 cpu.cfs_quota_us/cpu.cfs_period_us）中较小的一个
+def cpu_limit():
+    cpus = len(os.sched_getaffinity(0))
+
+    quota = period = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+    except OSError:
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = f.read().strip()
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = f.read().strip()
+        except OSError:
+            pass
+
+    if quota not in (None, "max", "-1"):
+        cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+
+    return cpus
+
+
+# GUNICORN_WORKERS、GUNICORN_THREADS 为 auto 时根据 CPU 数量计算：
+# sync worker 在等待数据库时会阻塞，使用 2 * CPU + 1 个进程；
+# gthread 和 asgi worker 本身可以并发处理请求，每个 CPU 一个进程即可。
+# gthread 的线程数等于连接池大小，多出的线程只会排队等待连接
+cpus = cpu_limit()
+
+workers = os.environ.get("GUNICORN_WORKERS", "auto")
+if workers == "auto":
+    workers = 2 * cpus + 1 if mode == "sync" else cpus
+workers = int(workers)
+
+threads = os.environ.get("GUNICORN_THREADS", "auto")
+if threads == "auto":
+    threads = os.environ.get("SQLALCHEMY_POOL_SIZE", "5") if mode == "gthread" else 1
+threads = int(threads)
+
+# 启动时创建并清空 Prometheus 多进程指标目录，避免上一次运行的数据被重复计算。
+# 必须在加载应用之前完成：preload_app 时 master 在调用 on_starting 之前就加载了应用，
+# 导入 prometheus_client 时目录必须已经存在，之后也不能再删除 master 已经打开的文件。
+# 重新加载配置（HUP）时会再次执行本文件，此时 worker 还在写入这些文件，不再清空
+multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if multiproc_dir and not os.environ.get("GUNICORN_PROMETHEUS_READY"):
+    os.makedirs(multiproc_dir, exist_ok=True)
+    for filename in glob.glob(os.path.join(multiproc_dir, "*.db")):
+        os.remove(filename)
+    os.environ["GUNICORN_PROMETHEUS_READY"] = "1"
+
+# 在 master 中加载应用，fork 出的 worker 通过写时复制共享已导入的模块，
+# 启动更快、每个 worker 占用的内存更少
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# 每个 worker 处理这么多请求后重启（加上随机抖动，避免所有 worker 同时重启），
+# 限制内存泄漏的影响。0 表示不重启
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# 保持空闲连接的秒数，应当比 nginx 等上游的空闲超时更长
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+
+# 延迟导入的模块（API 视图）在 preload_app 时由 master 在 fork 之前导入，
+# worker 共享它们，第一次请求不需要再导入；不使用 preload_app 时在 worker 中按需导入
+def when_ready(server):
+    if preload_app:
+        import application.api  # noqa: F401
+
+
+# preload_app 时 master 在 fork 之前已经创建了应用（以及 SQLAlchemy engine），
+# worker 丢弃继承来的连接池，避免多个进程共用同一个数据库连接的 socket。
+# close=False：不关闭这些连接，它们仍然属于 master
+def post_fork(server, worker):
+    if not preload_app:
+        return
+
+    from application.models import db
+
+    # asgi:app 通过 flask_app 属性引用 Flask 应用
+    app = worker.app.wsgi()
+    app = getattr(app, "flask_app", app)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+# worker 退出后，它的 live* 仪表盘指标不再参与汇总
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,16 +1,18 @@
 # 创建场景
 import os
-import json
 import signal
 import subprocess
+import sys
 import time
-import shutil
 
 # click是实现 Flask 命令的推荐方式
 import click
 
 import psycopg
 
+from application.settings import Settings, load_files
+from project_files import APPLICATION_CONFIG_PATH, compose_cmdline
+
 
 # 确保环境变量存在且具有值
 def setenv(variable, default):
@@ -20,35 +22,36 @@ def setenv(variable, default):
 # 设置应用程序配置环境变量的默认值
 setenv("APPLICATION_CONFIG", "development")
 
-APPLICATION_CONFIG_PATH = "config"
-DOCKER_PATH = "docker"
-
-
-# 封装文件路径的创建
-def app_config_file(config):
-    return os.path.join(APPLICATION_CONFIG_PATH, f"{config}.json")
-
-
-def docker_compose_file(config):
-    return os.path.join(DOCKER_PATH, f"{config}.yml")
+# 最近一次写入环境变量的配置：(名称, load_files 返回的值)
+_configured = None
 
 
-# 在configure_app函数中封装配置逻辑
+# 在configure_app函数中封装配置逻辑。配置文件的读取和合并由
+# application.settings.load_files 完成（按修改时间缓存），与环境变量合并后
+# 用 Settings 转换类型并校验：Settings 的字段写入校验后的值，其他变量
+# （FLASK_DEBUG、GUNICORN_* 等）原样写入。同一个进程中创建的应用直接使用这个 Settings。
+# 配置和文件都没有变化时不会再次写入环境变量
 def configure_app(config):
-    # 从相对的JSON文件中读取配置
-    with open(os.path.join("config", f"{config}.json")) as f:
-        config_data = json.load(f)
+    global _configured
 
-    # 将此配置转换为可用的Python字典
-    config_data = dict((i["name"], i["value"]) for i in config_data)
+    config_data = load_files(config, APPLICATION_CONFIG_PATH)
+    if _configured == (config, config_data):
+        return
 
+    settings = Settings.from_environ({**config_data, **os.environ})
     for key, value in config_data.items():
         setenv(key, value)
+    os.environ.update(settings.environ())
+
+    _configured = (config, config_data)
 
 
 @click.group()
-def cli():
-    pass
+@click.pass_context
+def cli(ctx):
+    # 命令结束时输出 SQL 耗时并关闭连接
+    ctx.call_on_close(sql.close)
+    ctx.call_on_close(sql.report)
 
 
 @cli.command(context_settings={"ignore_unknown_options": True})
@@ -60,7 +63,7 @@ def flask(subcommand):
     cmdline = ["flask"] + list(subcommand)
 
     try:
-        p = subprocess.Popen(cmdline)
+        p = subprocess.Popen(cmdline, env={**os.environ, "DB_MIGRATIONS": "1"})
         p.wait()
     except KeyboardInterrupt:
         p.send_signal(signal.SIGINT)
@@ -72,19 +75,11 @@ def docker_compose_cmdline(commands_string=None):
     config = os.getenv("APPLICATION_CONFIG")
     configure_app(config)
 
-    compose_file = docker_compose_file(config)
+    command_line = compose_cmdline(config)
 
-    if not os.path.isfile(compose_file):
-        raise ValueError(f"The file {compose_file} does not exist")
-
-    command_line = [
-        "docker",
-        "compose",
-        "-p",  # 为容器添加前缀，以在运行开发服务器的同时执行测试
-        config,
-        "-f",
-        compose_file,
-    ]
+    # PgBouncer 只在启用 pgbouncer profile 时启动（同时 web 通过它连接数据库）
+    if os.getenv("PGBOUNCER") == "1":
+        command_line.extend(["--profile", "pgbouncer"])
 
     if commands_string:
         command_line.extend(commands_string.split(" "))
@@ -92,9 +87,15 @@ def docker_compose_cmdline(commands_string=None):
     return command_line
 
 
+# --pgbouncer：启动 PgBouncer，web 通过它连接数据库，例如
+# ./manage.py compose --pgbouncer up -d（停止时同样需要 --pgbouncer）
 @cli.command(context_settings={"ignore_unknown_options": True})
+@click.option("--pgbouncer", is_flag=True, help="Connect through PgBouncer")
 @click.argument("subcommand", nargs=-1, type=str)
-def compose(subcommand):
+def compose(pgbouncer, subcommand):
+    if pgbouncer:
+        os.environ["PGBOUNCER"] = "1"
+
     cmdline = docker_compose_cmdline() + list(subcommand)
 
     try:
@@ -105,35 +106,99 @@ def compose(subcommand):
         p.wait()
 
 
-# 与 PostgreSQL 建立连接并执行传入的指令
-def run_sql(statements):
-    # 从JSON 配置文件中加载环境变量并连接到 PostgreSQL 服务器
-    conn = psycopg.connect(
-        dbname=os.getenv("POSTGRES_DB"),
+# 使用 JSON 配置文件中加载的环境变量连接到 PostgreSQL 服务器
+def connect_db(dbname=None, **kwargs):
+    return psycopg.connect(
+        dbname=dbname or os.getenv("POSTGRES_DB"),
         user=os.getenv("POSTGRES_USER"),
         password=os.getenv("POSTGRES_PASSWORD"),
         host=os.getenv("POSTGRES_HOSTNAME"),
         port=os.getenv("POSTGRES_PORT"),
+        **kwargs,
     )
-    # 自动提交每个语句
-    conn.autocommit = True
-    # 创建一个游标对象
-    cursor = conn.cursor()
-    # 使用游标循环执行列表里的每一条 SQL 语句
-    for statement in statements:
-        cursor.execute(statement)
 
-    # 手动关闭游标和连接，防止内存泄漏或连接数占满
-    cursor.close()
-    conn.close()
 
+# 每次命令调用只建立一个到 PostgreSQL 的连接并重复使用，同时记录每一步的耗时，
+# 命令结束时输出，方便查看准备环境的时间花在了哪里
+class SQLRunner:
+    def __init__(self):
+        self.conn = None
+        self.timings = []
+
+    def _timed(self, label, start):
+        elapsed = time.perf_counter() - start
+        self.timings.append((label, elapsed))
+        return elapsed
+
+    def connect(self, **kwargs):
+        if self.conn is None or self.conn.closed:
+            start = time.perf_counter()
+            # 自动提交每个语句，CREATE DATABASE 不能在事务块中执行
+            self.conn = connect_db(autocommit=True, **kwargs)
+            self._timed("connect", start)
+
+        return self.conn
+
+    # 使用 psycopg 3 的流水线模式执行一批语句：全部发送后再统一读取结果，
+    # 而不是每条语句都等待一次往返。返回耗时（秒）
+    def run(self, statements, label=None):
+        conn = self.connect()
+
+        start = time.perf_counter()
+        with conn.pipeline():
+            for statement in statements:
+                conn.execute(statement)
+
+        if label is None:
+            label = statements[0] if len(statements) == 1 else statements[0] + " ..."
+        return self._timed(label, start)
+
+    # 在一次往返中执行包含多条语句（以分号分隔）的脚本。这些语句在同一个隐式事务中执行，
+    # 所以不能包含 CREATE DATABASE 等语句。返回耗时（秒）
+    def run_script(self, script, label="script"):
+        conn = self.connect()
+
+        start = time.perf_counter()
+        conn.execute(script)
+
+        return self._timed(label, start)
 
-# 将等待数据库容器日志中消息的代码隔离出来
-def wait_for_logs(cmdline, message):
-    logs = subprocess.check_output(cmdline)
-    while message not in logs.decode("utf-8"):
-        time.sleep(0.1)
-        logs = subprocess.check_output(cmdline)
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def report(self):
+        if self.timings:
+            print("SQL timings:")
+            for label, elapsed in self.timings:
+                print(f"  {elapsed * 1000:9.1f} ms  {label}")
+
+
+sql = SQLRunner()
+
+
+# 等待数据库真正接受连接。日志中出现 "ready to accept connections" 时端口不一定可用，
+# 所以直接尝试连接，失败后按指数退避重试，超过 POSTGRES_READY_TIMEOUT 秒则放弃。
+# 成功建立的连接会留给 sql 在后续步骤中使用
+def wait_for_db():
+    timeout = float(os.getenv("POSTGRES_READY_TIMEOUT", "30"))
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+
+    while True:
+        remaining = deadline - time.monotonic()
+        try:
+            sql.connect(connect_timeout=max(1, int(remaining)))
+            return
+        except psycopg.OperationalError as e:
+            if remaining <= 0:
+                raise click.ClickException(
+                    f"The database is not ready after {timeout:g} seconds: {e}"
+                )
+
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 1)
 
 
 # 创建测试数据库
@@ -144,7 +209,7 @@ def create_initial_db():
 
     try:
         # 创建一个名为 XXX 的数据库
-        run_sql([f"CREATE DATABASE {os.getenv('APPLICATION_DB')}"])
+        sql.run([f"CREATE DATABASE {os.getenv('APPLICATION_DB')}"])
     except psycopg.errors.DuplicateDatabase:
         # 如果是第二次运行，PostgreSQL 会报错说“数据库已存在”
         print(
@@ -152,9 +217,34 @@ def create_initial_db():
         )
 
 
-@cli.command()
+# 为每个 pytest-xdist worker（gw0、gw1……）从模板数据库克隆一个数据库
+def create_worker_dbs(workers):
+    database = os.getenv("APPLICATION_DB")
+    template = f"{database}_template"
+
+    # 在模板数据库上执行一次迁移，所有 worker 的数据库都直接复制这个结构
+    sql.run([f"CREATE DATABASE {template}"])
+    subprocess.check_call(
+        ["flask", "db", "upgrade"],
+        env={**os.environ, "APPLICATION_DB": template, "DB_MIGRATIONS": "1"},
+    )
+
+    sql.run(
+        [
+            f"CREATE DATABASE {database}_gw{i} TEMPLATE {template}"
+            for i in range(workers)
+        ]
+    )
+
+
+# 未知选项原样传给 pytest。默认依次使用两种 database fixture（transaction 和
+# recreate）各运行一次测试，两种方式都保持通过；指定 --db-isolation 时只运行一次
+@cli.command(context_settings={"ignore_unknown_options": True})
+@click.option(
+    "--workers", default=0, help="Number of parallel pytest workers (pytest-xdist)"
+)
 @click.argument("filenames", nargs=-1)
-def test(filenames):
+def test(workers, filenames):
     # 加载文件 config/testing.json 中的配置
     os.environ["APPLICATION_CONFIG"] = "testing"
     configure_app(os.getenv("APPLICATION_CONFIG"))
@@ -163,110 +253,272 @@ def test(filenames):
     cmdline = docker_compose_cmdline("up -d")
     subprocess.call(cmdline)
 
-    # 获取数据库容器的日志
-    cmdline = docker_compose_cmdline("logs db")
-
     # 确保数据库完全启动后再运行测试
-    wait_for_logs(cmdline, "ready to accept connections")
-
-    # 创建测试数据库
-    run_sql([f"CREATE DATABASE {os.getenv('APPLICATION_DB')}"])
+    wait_for_db()
 
     # 运行测试
     cmdline = ["pytest", "-svv", "--cov=application", "--cov-report=term-missing"]
+
+    if workers:
+        # 每个 worker 使用自己的数据库，见 tests/conftest.py
+        create_worker_dbs(workers)
+        cmdline.extend(["-n", str(workers)])
+    else:
+        # 创建测试数据库
+        sql.run([f"CREATE DATABASE {os.getenv('APPLICATION_DB')}"])
+
     cmdline.extend(filenames)
-    subprocess.call(cmdline)
+    if any(arg.startswith("--db-isolation") for arg in filenames):
+        runs = [cmdline]
+    else:
+        runs = [
+            cmdline + ["--db-isolation=transaction"],
+            # 第二次运行的覆盖率与第一次合并
+            cmdline + ["--db-isolation=recreate", "--cov-append"],
+        ]
+    returncodes = [subprocess.call(run) for run in runs]
 
     # 停止并移除所有测试容器。确保每次测试后环境干净，不会留下残留的容器
     cmdline = docker_compose_cmdline("down")
     subprocess.call(cmdline)
 
+    if any(returncodes):
+        sys.exit(1)
+
+
+# 等待 HTTP 服务可以响应请求
+def wait_for_http(url, timeout=30):
+    import urllib.error
+    import urllib.request
+
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=timeout).close()
+            return
+        except (urllib.error.URLError, OSError) as e:
+            if time.monotonic() > deadline:
+                raise click.ClickException(f"{url} is not ready: {e}")
+
+        time.sleep(delay)
+        delay = min(delay * 2, 1)
+
+
+DEFAULT_BENCH_PATHS = [
+    "/",
+    "/users",
+    "/api/users?limit=100",
+    "/api/users/by-email?email=user1@benchmark.local",
+]
+
+
+# 基准测试：启动应用，准备 --users 个用户，用异步负载生成器并发请求各个路由，
+# 输出吞吐量和延迟分位数，并把结果保存到 benchmarks/results 中。
+#   --target local：在本机用 gunicorn 启动应用，使用当前配置中的数据库
+#   --target compose：启动 production 配置的 Docker Compose（nginx → gunicorn → postgres）
+#   --url：直接测试一个已经在运行的服务
+# 比较不同的 worker 类型：./manage.py bench --worker-class sync --worker-class asgi
+# 比较 nginx 微缓存的效果（环境变量优先于 config/production.json）：
+#   NGINX_PROXY_CACHE=off ./manage.py bench --target compose
+#   ./manage.py bench --target compose --baseline benchmarks/results/<上一次的结果>.json
+# 比较直连和通过 PgBouncer 连接（同时输出数据库的后端连接数）：
+#   ./manage.py bench --target compose
+#   ./manage.py bench --target compose --pgbouncer --baseline <上一次的结果>.json
+@cli.command()
+@click.option("--target", type=click.Choice(["local", "compose"]), default="local")
+@click.option("--url", help="Benchmark an already running server")
+@click.option("--users", default=100_000, help="Number of users to seed")
+@click.option("--concurrency", default=32, help="Number of concurrent connections")
+@click.option("--duration", default=10.0, help="Duration of the run in seconds")
+@click.option("--workers", help="Number of gunicorn workers (local, default: auto)")
+@click.option("--threads", help="Threads per gthread worker (local, default: auto)")
+@click.option(
+    "--worker-class",
+    "worker_classes",
+    type=click.Choice(["sync", "gthread", "asgi"]),
+    multiple=True,
+    default=["sync"],
+    help="Gunicorn worker class to compare (local, repeatable)",
+)
+@click.option("--path", "paths", multiple=True, help="Path to request (repeatable)")
+@click.option("--pgbouncer", is_flag=True, help="Connect through PgBouncer (compose)")
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Results file to compare with",
+)
+@click.pass_context
+def bench(
+    ctx,
+    target,
+    url,
+    users,
+    concurrency,
+    duration,
+    workers,
+    threads,
+    worker_classes,
+    paths,
+    pgbouncer,
+    baseline,
+):
+    import asyncio
+
+    from benchmarks import loadgen, results
+    from benchmarks.backends import BackendSampler
+
+    if target == "compose":
+        os.environ["APPLICATION_CONFIG"] = "production"
+        if pgbouncer:
+            os.environ["PGBOUNCER"] = "1"
+    configure_app(os.getenv("APPLICATION_CONFIG"))
+    paths = list(paths) or DEFAULT_BENCH_PATHS
+
+    if target == "compose":
+        subprocess.check_call(docker_compose_cmdline("up -d --build"))
+        wait_for_db()
+        ctx.invoke(create_initial_db)
+        subprocess.check_call(
+            docker_compose_cmdline("exec -T -e DB_MIGRATIONS=1 web flask db upgrade")
+        )
+    else:
+        wait_for_db()
+        ctx.invoke(create_initial_db)
+        subprocess.check_call(
+            ["flask", "db", "upgrade"], env={**os.environ, "DB_MIGRATIONS": "1"}
+        )
+
+    # 在本机准备数据，直接连接 PostgreSQL：pgbouncer 服务只在 compose 网络中可以访问
+    if users:
+        subprocess.check_call(
+            [sys.executable, "-m", "benchmarks.seed", str(users)],
+            env={**os.environ, "PGBOUNCER": "0"},
+        )
+
+    # 依次测试每种 worker 类型（只用于 --target local），第一种作为后面几种的比较基准
+    if target == "compose" or url is not None:
+        worker_classes = [None]
+
+    baseline = results.load(baseline)["results"] if baseline else None
+    for worker_class in worker_classes:
+        server = None
+        if target == "local" and url is None:
+            # 进程数和线程数默认由 gunicorn.conf.py 按 CPU 数量计算
+            env = {**os.environ, "GUNICORN_WORKER_CLASS": worker_class}
+            if workers:
+                env["GUNICORN_WORKERS"] = workers
+            if threads:
+                env["GUNICORN_THREADS"] = threads
+            server = subprocess.Popen(
+                ["gunicorn", "-c", "gunicorn.conf.py", "-b", "127.0.0.1:8001"],
+                env=env,
+            )
+            print(f"Worker class {worker_class}")
+
+        run_url = url or (
+            "http://localhost:8080" if target == "compose" else "http://127.0.0.1:8001"
+        )
+        try:
+            wait_for_http(run_url)
+            # 同时统计数据库的后端连接数
+            with BackendSampler(connect_db, os.getenv("APPLICATION_DB")) as backends:
+                raw, elapsed = asyncio.run(
+                    loadgen.run_load(run_url, paths, concurrency, duration)
+                )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            if target == "compose":
+                subprocess.call(docker_compose_cmdline("down"))
+
+        summary = loadgen.summarize(raw, elapsed)
+        results.print_summary(summary, baseline)
+        baseline = baseline or summary
+        backend_summary = backends.summary()
+        print(
+            f"PostgreSQL backends: max {backend_summary['max']}, "
+            f"mean {backend_summary['mean']}"
+        )
+
+        filename = results.save(
+            {
+                "target": target,
+                "url": run_url,
+                "users": users,
+                "concurrency": concurrency,
+                "duration": duration,
+                "worker_class": worker_class,
+                "workers": (workers or "auto") if server is not None else None,
+                "threads": (threads or "auto") if server is not None else None,
+                "pgbouncer": os.getenv("PGBOUNCER") == "1",
+                "backends": backend_summary,
+                "results": summary,
+            }
+        )
+        print(f"Results saved to {filename}")
+
 
 @cli.group()
-def scenario():
+def export():
     pass
 
 
-@scenario.command()
-@click.argument("name")
-def up(name):
-    # 将配置环境设置为特定场景
-    os.environ["APPLICATION_CONFIG"] = f"scenario_{name}"
-    config = os.getenv("APPLICATION_CONFIG")
+# 流式导出 users 表，例如 ./manage.py export users --format ndjson --gzip -o users.ndjson.gz
+@export.command()
+@click.option("--format", type=click.Choice(["csv", "ndjson"]), default="csv")
+@click.option("--gzip", "compress", is_flag=True, help="Compress the output with gzip")
+@click.option("-o", "--output", type=click.File("wb"), default="-")
+def users(format, compress, output):
+    from application.export import EXPORTERS, gzip_stream
 
-    # 复制场景配置文件，使每个场景可以有独立的配置
-    scenario_config_source_file = app_config_file("scenario")
-    scenario_config_file = app_config_file(config)
+    configure_app(os.getenv("APPLICATION_CONFIG"))
 
-    if not os.path.isfile(scenario_config_source_file):
-        raise ValueError(f"File {scenario_config_source_file} doesn't exist")
-    shutil.copy(scenario_config_source_file, scenario_config_file)
+    start = time.perf_counter()
+    size = 0
+    with connect_db(os.getenv("APPLICATION_DB")) as conn:
+        chunks = EXPORTERS[format][0](conn)
+        if compress:
+            chunks = gzip_stream(chunks)
 
-    scenario_docker_source_file = docker_compose_file("scenario")
-    scenario_docker_file = docker_compose_file(config)
+        for chunk in chunks:
+            output.write(chunk)
+            size += len(chunk)
 
-    if not os.path.isfile(scenario_docker_source_file):
-        raise ValueError(f"File {scenario_docker_source_file} doesn't exist")
-    shutil.copy(docker_compose_file("scenario"), scenario_docker_file)
+    click.echo(
+        f"Exported {size} bytes in {time.perf_counter() - start:.2f}s", err=True
+    )
 
-    configure_app(f"scenario_{name}")
 
-    # 启动 Docker 容器
-    cmdline = docker_compose_cmdline("up -d")
-    subprocess.call(cmdline)
+@cli.group()
+def scenario():
+    pass
 
-    # 等待数据库容器启动完成
-    cmdline = docker_compose_cmdline("logs db")
-    wait_for_logs(cmdline, "ready to accept connections")
-
-    # 获取数据库容器的端口号
-    cmdline = docker_compose_cmdline("port db 5432")
-    out = subprocess.check_output(cmdline)
-    port = out.decode("utf-8").replace("\n", "").split(":")[1]
-    os.environ["POSTGRES_PORT"] = port
-    
-    # 创建场景数据库
-    run_sql([f"CREATE DATABASE {os.getenv('APPLICATION_DB')}"])
-    
-    # 导入并运行场景脚本
-    scenario_module = f"scenarios.{name}"
-    scenario_file = os.path.join("scenarios", f"{name}.py")
-    if os.path.isfile(scenario_file):
-        import importlib
-
-        os.environ["APPLICATION_SCENARIO_NAME"] = name
-
-        scenario = importlib.import_module(scenario_module)
-        scenario.run()
-    
-    cmdline = " ".join(
-        docker_compose_cmdline(
-            "exec db psql -U {} -d {}".format(
-                os.getenv("POSTGRES_USER"), os.getenv("APPLICATION_DB")
-            )
-        )
-    )
-    print("Your scenario is ready. If you want to open a SQL shell run")
-    print(cmdline)
 
+# 同时启动多个场景，例如 ./manage.py scenario up foo many_users，见 orchestrator.py
+@scenario.command()
+@click.argument("names", nargs=-1, required=True)
+@click.option(
+    "--invalidate", is_flag=True, help="Discard the cached snapshot of the scenario"
+)
+def up(names, invalidate):
+    import asyncio
+
+    import orchestrator
+
+    asyncio.run(orchestrator.up(names, invalidate))
 
+
+# 停止场景的容器并删除为它们创建的临时配置文件
 @scenario.command()
-@click.argument("name")
-def down(name):
-    # 设置环境配置,确保使用正确的场景配置
-    os.environ["APPLICATION_CONFIG"] = f"scenario_{name}"
-    config = os.getenv("APPLICATION_CONFIG")
-    
-    # 停止 Docker 容器
-    cmdline = docker_compose_cmdline("down")
-    subprocess.call(cmdline)
+@click.argument("names", nargs=-1, required=True)
+def down(names):
+    import asyncio
 
-    # 清理配置文件。删除为该场景创建的临时配置文件
-    scenario_config_file = app_config_file(config)
-    os.remove(scenario_config_file)
+    import orchestrator
 
-    scenario_docker_file = docker_compose_file(config)
-    os.remove(scenario_docker_file)
+    asyncio.run(orchestrator.down(names))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+"""Users counter table and triggers
+
+Revision ID: 3f9a1c2d7b6e
+Revises: 649cfc34f4ef
+Create Date: 2026-10-18 09:12:40.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2d7b6e'
+down_revision = '649cfc34f4ef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('counters',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    # 语句级触发器，一条 INSERT/COPY/DELETE 只更新一次计数行
+    op.execute("""
+    CREATE OR REPLACE FUNCTION count_users() RETURNS trigger AS $$
+    DECLARE
+        delta bigint;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT count(*) INTO delta FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT -count(*) INTO delta FROM old_rows;
+        ELSE
+            UPDATE counters SET value = 0 WHERE name = 'users';
+            RETURN NULL;
+        END IF;
+
+        IF delta <> 0 THEN
+            UPDATE counters SET value = value + delta WHERE name = 'users';
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    CREATE TRIGGER users_count_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_users()
+    """)
+    op.execute("""
+    CREATE TRIGGER users_count_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_users()
+    """)
+    op.execute("""
+    CREATE TRIGGER users_count_truncate AFTER TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION count_users()
+    """)
+
+    # 锁住 users 的写入，保证初始计数和触发器之间不会漏掉并发插入的行
+    op.execute("LOCK TABLE users IN SHARE MODE")
+    op.execute("INSERT INTO counters (name, value) SELECT 'users', count(*) FROM users")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER users_count_truncate ON users")
+    op.execute("DROP TRIGGER users_count_delete ON users")
+    op.execute("DROP TRIGGER users_count_insert ON users")
+    op.execute("DROP FUNCTION count_users()")
+    op.drop_table('counters')
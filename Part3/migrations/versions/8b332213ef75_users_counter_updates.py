@@ -0,0 +1,82 @@
+"""Touch the users counter on UPDATE
+
+Revision ID: 8b332213ef75
+Revises: b7e2a9f46c13
+Create Date: 2026-10-18 19:12:44.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b332213ef75'
+down_revision = 'b7e2a9f46c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # UPDATE 不改变行数，但会改变内容：只更新 updated_at，
+    # 使基于计数表的 ETag 和 Last-Modified 失效
+    op.execute("""
+    CREATE OR REPLACE FUNCTION count_users() RETURNS trigger AS $$
+    DECLARE
+        delta bigint;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT count(*) INTO delta FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT -count(*) INTO delta FROM old_rows;
+        ELSIF TG_OP = 'UPDATE' THEN
+            IF EXISTS (SELECT 1 FROM new_rows) THEN
+                UPDATE counters SET updated_at = clock_timestamp()
+                WHERE name = 'users';
+            END IF;
+            RETURN NULL;
+        ELSE
+            UPDATE counters SET value = 0, updated_at = clock_timestamp()
+            WHERE name = 'users';
+            RETURN NULL;
+        END IF;
+
+        IF delta <> 0 THEN
+            UPDATE counters SET value = value + delta, updated_at = clock_timestamp()
+            WHERE name = 'users';
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    CREATE TRIGGER users_count_update AFTER UPDATE ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_users()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER users_count_update ON users")
+    op.execute("""
+    CREATE OR REPLACE FUNCTION count_users() RETURNS trigger AS $$
+    DECLARE
+        delta bigint;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT count(*) INTO delta FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT -count(*) INTO delta FROM old_rows;
+        ELSE
+            UPDATE counters SET value = 0, updated_at = clock_timestamp()
+            WHERE name = 'users';
+            RETURN NULL;
+        END IF;
+
+        IF delta <> 0 THEN
+            UPDATE counters SET value = value + delta, updated_at = clock_timestamp()
+            WHERE name = 'users';
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
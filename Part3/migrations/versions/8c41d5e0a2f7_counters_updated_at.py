@@ -0,0 +1,72 @@
+"""Track when counters change
+
+Revision ID: 8c41d5e0a2f7
+Revises: 3f9a1c2d7b6e
+Create Date: 2026-10-18 14:03:27.905113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d5e0a2f7'
+down_revision = '3f9a1c2d7b6e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('counters', sa.Column('updated_at', sa.DateTime(timezone=True),
+                  server_default=sa.text('now()'), nullable=False))
+
+    # 计数变化时同时记录时间
+    op.execute("""
+    CREATE OR REPLACE FUNCTION count_users() RETURNS trigger AS $$
+    DECLARE
+        delta bigint;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT count(*) INTO delta FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT -count(*) INTO delta FROM old_rows;
+        ELSE
+            UPDATE counters SET value = 0, updated_at = clock_timestamp()
+            WHERE name = 'users';
+            RETURN NULL;
+        END IF;
+
+        IF delta <> 0 THEN
+            UPDATE counters SET value = value + delta, updated_at = clock_timestamp()
+            WHERE name = 'users';
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade():
+    op.execute("""
+    CREATE OR REPLACE FUNCTION count_users() RETURNS trigger AS $$
+    DECLARE
+        delta bigint;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT count(*) INTO delta FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT -count(*) INTO delta FROM old_rows;
+        ELSE
+            UPDATE counters SET value = 0 WHERE name = 'users';
+            RETURN NULL;
+        END IF;
+
+        IF delta <> 0 THEN
+            UPDATE counters SET value = value + delta WHERE name = 'users';
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+
+    op.drop_column('counters', 'updated_at')
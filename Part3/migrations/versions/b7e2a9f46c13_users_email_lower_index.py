@@ -0,0 +1,31 @@
+"""Case-insensitive unique index on users.email
+
+Revision ID: b7e2a9f46c13
+Revises: 8c41d5e0a2f7
+Create Date: 2026-10-18 16:41:09.552870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2a9f46c13'
+down_revision = '8c41d5e0a2f7'
+branch_labels = None
+depends_on = None
+
+
+# CONCURRENTLY 不会在建索引期间阻塞写入，但不能在事务中执行。
+# 如果已有只是大小写不同的邮箱，建索引会失败并留下 INVALID 的索引，需要先清理数据并删除该索引
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')],
+                        unique=True, postgresql_include=['id', 'email'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_email_lower', table_name='users',
+                      postgresql_concurrently=True)
@@ -0,0 +1,311 @@
+# 并发地启动和停止场景：./manage.py scenario up a b c
+# 每个场景是一个独立的 docker compose 项目（scenario_<name>），使用自己的环境变量
+# （不修改 os.environ），所有场景同时启动。同一个场景中，构建 web 镜像与
+# 启动数据库 → 等待数据库就绪 → 创建数据库 → 准备场景数据同时进行，之后启动 web。
+# 子进程的输出被收集起来，失败时才输出（场景脚本的输出在产生时就加上 [名称] 输出）；
+# 结束时输出每一步的开始时间和耗时
+import asyncio
+import os
+import shutil
+import sys
+import time
+
+import click
+import psycopg
+
+from application.settings import load_files
+from project_files import (
+    SCENARIO_CACHE_PATH,
+    app_config_file,
+    compose_cmdline,
+    docker_compose_file,
+    scenario_snapshot_file,
+    scenario_snapshot_files,
+)
+
+
+# 记录每个场景每一步的开始时间（相对于 Timings 创建的时间）和耗时
+class Timings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.steps = []
+
+    def record(self, scenario, step, start, ok):
+        now = time.perf_counter()
+        self.steps.append((scenario, step, start - self.start, now - start, ok))
+
+    def report(self):
+        wall = time.perf_counter() - self.start
+        busy = sum(step[3] for step in self.steps)
+        print(f"Timings (wall clock {wall:.2f} s, sum of steps {busy:.2f} s):")
+        print(f"  {'scenario':<16} {'step':<20} {'start':>8} {'duration':>9}")
+        for scenario, step, start, elapsed, ok in sorted(
+            self.steps, key=lambda s: (s[0], s[2])
+        ):
+            status = "" if ok else "  failed"
+            print(
+                f"  {scenario:<16} {step:<20} {start:>7.2f}s {elapsed:>8.2f}s{status}"
+            )
+
+
+class Scenario:
+    def __init__(self, name, timings):
+        self.name = name
+        self.config = f"scenario_{name}"
+        self.timings = timings
+        self.env = None
+
+    # 复制场景的配置文件和 Docker Compose 文件，使每个场景可以有独立的配置
+    def prepare(self):
+        for source, target in [
+            (app_config_file("scenario"), app_config_file(self.config)),
+            (docker_compose_file("scenario"), docker_compose_file(self.config)),
+        ]:
+            if not os.path.isfile(source):
+                raise ValueError(f"File {source} doesn't exist")
+            shutil.copy(source, target)
+
+        self.load_env()
+
+    # 环境变量优先于配置文件（与 configure_app 相同）
+    def load_env(self):
+        self.env = {
+            **load_files(self.config),
+            **os.environ,
+            "APPLICATION_CONFIG": self.config,
+        }
+
+    # 与 manage.docker_compose_cmdline 相同，接收一个字符串，并在内部将其转换为列表
+    def compose(self, commands_string):
+        return compose_cmdline(self.config) + commands_string.split(" ")
+
+    async def step(self, label, coro):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = await coro
+            ok = True
+            return result
+        finally:
+            self.timings.record(self.name, label, start, ok)
+
+    # 运行一个子进程，返回它的标准输出。stdout 可以是打开的文件。
+    # 失败时异常中包含子进程的标准输出（如果没有写入文件）和标准错误
+    async def run(self, label, cmdline, stdout=asyncio.subprocess.PIPE, env=None):
+        async def run():
+            process = await asyncio.create_subprocess_exec(
+                *cmdline,
+                env=env or self.env,
+                stdout=stdout,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            out, err = await process.communicate()
+            if process.returncode != 0:
+                output = (out or b"") + err
+                raise click.ClickException(
+                    f"[{self.name}] {' '.join(cmdline)} failed:\n"
+                    f"{output.decode('utf-8').strip()}"
+                )
+
+            return out
+
+        return await self.step(label, run())
+
+    # 运行一个子进程，标准输出和标准错误的每一行在产生时加上 [名称] 输出，
+    # 同时运行的场景的输出可以区分开
+    async def stream(self, label, cmdline, env=None):
+        async def stream():
+            process = await asyncio.create_subprocess_exec(
+                *cmdline,
+                env=env or self.env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            async for line in process.stdout:
+                print(f"[{self.name}] {line.decode('utf-8').rstrip()}", flush=True)
+
+            if await process.wait() != 0:
+                raise click.ClickException(
+                    f"[{self.name}] {' '.join(cmdline)} failed with exit code "
+                    f"{process.returncode}, see its output above"
+                )
+
+        await self.step(label, stream())
+
+    # 构建镜像不需要数据库，与数据库的准备同时进行。
+    # 同一个项目中同时运行两个 compose up 会争着创建项目的网络（network ... already
+    # exists），所以 web 在数据库启动之后才启动
+    async def up(self, invalidate):
+        results = await asyncio.gather(
+            self.run("build web", self.compose("build web")),
+            self.prepare_db(invalidate),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        await self.run("start web", self.compose("up -d web"))
+
+    async def prepare_db(self, invalidate):
+        await self.run("start db", self.compose("up -d db"))
+
+        # 获取数据库容器的端口号
+        out = await self.run("port db", self.compose("port db 5432"))
+        self.env["POSTGRES_PORT"] = out.decode("utf-8").strip().rsplit(":", 1)[1]
+
+        conn = await self.step("wait for db", self.wait_for_db())
+        async with conn:
+            await self.step(
+                "create database",
+                conn.execute(f"CREATE DATABASE {self.env['APPLICATION_DB']}"),
+            )
+
+        await self.load_data(invalidate)
+
+    # 与 manage.wait_for_db 相同：直接尝试连接，失败后按指数退避重试
+    async def wait_for_db(self):
+        timeout = float(self.env.get("POSTGRES_READY_TIMEOUT", "30"))
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                return await psycopg.AsyncConnection.connect(
+                    dbname=self.env["POSTGRES_DB"],
+                    user=self.env["POSTGRES_USER"],
+                    password=self.env["POSTGRES_PASSWORD"],
+                    host=self.env["POSTGRES_HOSTNAME"],
+                    port=self.env["POSTGRES_PORT"],
+                    # CREATE DATABASE 不能在事务块中执行
+                    autocommit=True,
+                    connect_timeout=max(1, int(remaining)),
+                )
+            except psycopg.OperationalError as e:
+                if remaining <= 0:
+                    raise click.ClickException(
+                        f"[{self.name}] The database is not ready after "
+                        f"{timeout:g} seconds: {e}"
+                    )
+
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1)
+
+    # 运行场景脚本。第一次运行后保存快照，之后直接恢复快照而不是重新运行脚本
+    async def load_data(self, invalidate):
+        if not os.path.isfile(os.path.join("scenarios", f"{self.name}.py")):
+            return
+
+        snapshot_file = scenario_snapshot_file(self.name, self.config, self.env)
+        if invalidate:
+            for filename in scenario_snapshot_files(self.name):
+                os.remove(filename)
+
+        if os.path.isfile(snapshot_file):
+            await self.restore_snapshot(snapshot_file)
+            print(f"Restored scenario {self.name} from {snapshot_file}")
+            return
+
+        # 脚本在子进程中运行，使用该场景的环境变量
+        await self.stream(
+            "run scenario",
+            [
+                sys.executable,
+                # 不缓冲输出，脚本的输出立即出现
+                "-u",
+                "-c",
+                f"import scenarios.{self.name} as scenario; scenario.run()",
+            ],
+            env={**self.env, "APPLICATION_SCENARIO_NAME": self.name},
+        )
+
+        await self.save_snapshot(snapshot_file)
+        print(f"Saved scenario {self.name} to {snapshot_file}")
+
+    # 将场景数据库导出为 pg_dump 自定义格式的快照，并删除该场景过期的快照
+    async def save_snapshot(self, snapshot_file):
+        os.makedirs(SCENARIO_CACHE_PATH, exist_ok=True)
+        for filename in scenario_snapshot_files(self.name):
+            os.remove(filename)
+
+        cmdline = self.compose(
+            "exec -T db pg_dump -Fc -U {} {}".format(
+                self.env["POSTGRES_USER"], self.env["APPLICATION_DB"]
+            )
+        )
+        # 先写入临时文件，导出中断时不会留下不完整的快照
+        with open(f"{snapshot_file}.tmp", "wb") as f:
+            await self.run("save snapshot", cmdline, stdout=f)
+        os.replace(f"{snapshot_file}.tmp", snapshot_file)
+
+    # 将快照复制到数据库容器中，并行恢复到场景数据库
+    async def restore_snapshot(self, snapshot_file):
+        await self.run(
+            "copy snapshot",
+            self.compose(f"cp {snapshot_file} db:/tmp/snapshot.dump"),
+        )
+        await self.run(
+            "restore snapshot",
+            self.compose(
+                "exec -T db pg_restore -U {} -d {} -j 4 --no-owner "
+                "/tmp/snapshot.dump".format(
+                    self.env["POSTGRES_USER"], self.env["APPLICATION_DB"]
+                )
+            ),
+        )
+
+    async def down(self):
+        self.load_env()
+        await self.run("down", self.compose("down"))
+
+        # 清理为该场景创建的临时配置文件
+        os.remove(app_config_file(self.config))
+        os.remove(docker_compose_file(self.config))
+
+
+# 同时运行所有场景的 action，一个场景失败不影响其他场景；
+# 输出每一步的耗时，有场景失败时最后抛出异常
+async def _run_all(names, action):
+    timings = Timings()
+    scenarios = [Scenario(name, timings) for name in dict.fromkeys(names)]
+
+    results = await asyncio.gather(
+        *(action(scenario) for scenario in scenarios), return_exceptions=True
+    )
+    timings.report()
+
+    failed = [
+        (scenario, result)
+        for scenario, result in zip(scenarios, results)
+        if isinstance(result, BaseException)
+    ]
+    for scenario, error in failed:
+        click.echo(f"Scenario {scenario.name} failed: {error}", err=True)
+    if failed:
+        raise click.ClickException(
+            f"{len(failed)} of {len(scenarios)} scenarios failed"
+        )
+
+    return scenarios
+
+
+async def up(names, invalidate=False):
+    async def action(scenario):
+        scenario.prepare()
+        await scenario.up(invalidate)
+
+    scenarios = await _run_all(names, action)
+
+    print("Your scenarios are ready. If you want to open a SQL shell run")
+    for scenario in scenarios:
+        cmdline = scenario.compose(
+            "exec db psql -U {} -d {}".format(
+                scenario.env["POSTGRES_USER"], scenario.env["APPLICATION_DB"]
+            )
+        )
+        print(" ".join(cmdline))
+
+
+async def down(names):
+    await _run_all(names, lambda scenario: scenario.down())
@@ -0,0 +1,67 @@
+# manage.py 和 orchestrator.py 共用的文件路径和命令行：配置文件、Docker Compose 文件
+# 和场景快照。orchestrator.py 不导入 manage.py（./manage.py 运行时它是 __main__，
+# 再导入一次会重复执行整个脚本）
+import glob
+import hashlib
+import os
+
+from application.settings import load_files
+
+APPLICATION_CONFIG_PATH = "config"
+DOCKER_PATH = "docker"
+# 场景数据库快照（pg_dump -Fc）的保存位置
+SCENARIO_CACHE_PATH = os.path.join("scenarios", ".cache")
+
+
+# 封装文件路径的创建
+def app_config_file(config):
+    return os.path.join(APPLICATION_CONFIG_PATH, f"{config}.json")
+
+
+def docker_compose_file(config):
+    return os.path.join(DOCKER_PATH, f"{config}.yml")
+
+
+# 快照文件名包含场景脚本、应用代码和迁移文件的哈希，以及场景运行时的配置：
+# 配置文件中的变量和 SCENARIO_* 变量在 env 中的值（环境变量可能覆盖配置文件），
+# 其中任意一个变化都会使快照失效。数据库端口由 docker compose 分配，不影响数据
+def scenario_snapshot_file(name, config, env):
+    files = [os.path.join("scenarios", f"{name}.py")]
+    files.extend(sorted(glob.glob(os.path.join("application", "*.py"))))
+    files.extend(sorted(glob.glob(os.path.join("migrations", "versions", "*.py"))))
+
+    digest = hashlib.sha256()
+    for filename in files:
+        digest.update(filename.encode("utf-8"))
+        with open(filename, "rb") as f:
+            digest.update(f.read())
+
+    keys = set(load_files(config, APPLICATION_CONFIG_PATH))
+    keys.update(key for key in env if key.startswith("SCENARIO_"))
+    keys.discard("POSTGRES_PORT")
+    for key in sorted(keys):
+        digest.update(f"\0{key}={env.get(key, '')}".encode("utf-8"))
+
+    return os.path.join(SCENARIO_CACHE_PATH, f"{name}-{digest.hexdigest()[:16]}.dump")
+
+
+# 该场景所有已保存的快照（包括过期的）
+def scenario_snapshot_files(name):
+    return glob.glob(os.path.join(SCENARIO_CACHE_PATH, f"{name}-*.dump"))
+
+
+# 配置 config 对应的 Docker Compose 命令行（不包括子命令）
+def compose_cmdline(config):
+    compose_file = docker_compose_file(config)
+
+    if not os.path.isfile(compose_file):
+        raise ValueError(f"The file {compose_file} does not exist")
+
+    return [
+        "docker",
+        "compose",
+        "-p",  # 为容器添加前缀，以在运行开发服务器的同时执行测试
+        config,
+        "-f",
+        compose_file,
+    ]
@@ -0,0 +1,18 @@
+# 大规模用户场景：通过 COPY 写入 SCENARIO_USERS 个用户（默认一百万）
+import os
+
+from application.app import create_app
+from application.bulk import copy_users, generate_users
+from application.models import db
+
+app = create_app("development")
+
+
+def run():
+    num_users = int(os.getenv("SCENARIO_USERS", "1000000"))
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        copy_users(generate_users(num_users))
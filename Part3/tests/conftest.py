@@ -1,11 +1,47 @@
+import os
+import time
+
 import pytest
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 from application.app import create_app
 from application.models import db
 
+# 并行运行时（./manage.py test --workers N）每个 pytest-xdist worker 使用自己的数据库，
+# 必须在 create_app() 导入 application.config 之前设置
+worker = os.getenv("PYTEST_XDIST_WORKER")
+if worker:
+    os.environ["APPLICATION_DB"] = f"{os.environ['APPLICATION_DB']}_{worker}"
+
+# database fixture 准备和清理的累计耗时，在测试结束时输出
+_database_timings = {"tests": 0, "seconds": 0.0}
+
+
+def pytest_addoption(parser):
+    # transaction：只创建一次表结构，每个测试在外层事务中运行，结束时回滚（默认，更快）
+    # recreate：每个测试前执行 drop_all/create_all（原有方式）
+    parser.addoption(
+        "--db-isolation",
+        choices=["transaction", "recreate"],
+        default="transaction",
+        help="How the database fixture isolates tests from each other",
+    )
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    tests = _database_timings["tests"]
+    if tests:
+        seconds = _database_timings["seconds"]
+        terminalreporter.write_line(
+            f"database fixture ({config.getoption('--db-isolation')}): "
+            f"{tests} tests, {seconds:.3f}s setup/teardown, "
+            f"{seconds / tests * 1000:.1f}ms per test"
+        )
+
 
 # @pytest.fixture 装饰的函数可以被项目中的所有测试文件自动访问，无需导入
-@pytest.fixture
+# 整个测试会话共用一个应用实例（以及它的连接池）
+@pytest.fixture(scope="session")
 # 便于其他 fixture 使用。
 def app():
     # 创建测试环境的应用实例
@@ -14,12 +50,86 @@ def app():
     return app
 
 
+@pytest.fixture(scope="session")
+# 整个测试会话只创建一次表结构
+def schema(app):
+    with app.app_context():
+        db.drop_all()  # 清理上一次运行留下的表
+        db.create_all()
+
+
+@pytest.fixture(scope="function")
+# 用于与数据库本身交互，按 --db-isolation 选择具体的实现
+def database(app, request):
+    return request.getfixturevalue(
+        f"{request.config.getoption('--db-isolation')}_database"
+    )
+
+
+# 等待所有副本重放到主库当前的 WAL 位置。重建表之后读取被发送到副本，
+# 副本还没有重放 CREATE TABLE 时会找不到表
+def wait_for_replicas(app, timeout=10):
+    replicas = app.extensions.get("replicas")
+    if replicas is None:
+        return
+
+    lsn = db.session.execute(db.text("SELECT pg_current_wal_lsn()")).scalar()
+    db.session.commit()
+    deadline = time.monotonic() + timeout
+    for engine in replicas.engines:
+        with engine.connect() as connection:
+            while not connection.execute(
+                db.text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"),
+                {"lsn": lsn},
+            ).scalar():
+                assert time.monotonic() < deadline, f"{engine.url} is not replicating"
+                connection.rollback()
+                time.sleep(0.01)
+
+
+# 累计 database fixture 准备和清理的耗时
+def _record_timing(start, tests=0):
+    _database_timings["tests"] += tests
+    _database_timings["seconds"] += time.perf_counter() - start
+
+
 @pytest.fixture(scope="function")
-# 用于与数据库本身交互
-def database(app):
+def recreate_database(app):
+    start = time.perf_counter()
     with app.app_context():
         # 重置数据库，防止上一次测试的函数留下脏数据
         db.drop_all()  # 清理数据库
         db.create_all()  # 创建所有表
+        wait_for_replicas(app)
+    _record_timing(start, tests=1)
 
     yield db  # 提供数据库连接给测试使用
+
+
+@pytest.fixture(scope="function")
+def transaction_database(app, schema):
+    start = time.perf_counter()
+    with app.app_context():
+        # 外层事务在测试结束时回滚，测试中的 commit() 只会释放 SAVEPOINT
+        connection = db.engine.connect()
+        transaction = connection.begin()
+
+        session = db.session
+        db.session = scoped_session(
+            sessionmaker(
+                bind=connection,
+                join_transaction_mode="create_savepoint",
+                query_cls=db.Query,
+            )
+        )
+        _record_timing(start, tests=1)
+
+        yield db  # 提供数据库连接给测试使用
+
+        start = time.perf_counter()
+        db.session.remove()
+        db.session = session
+
+        transaction.rollback()
+        connection.close()
+        _record_timing(start)
@@ -0,0 +1,95 @@
+# JSON API
+import pytest
+
+from application.bulk import copy_users, generate_users
+from application.models import User
+
+
+def test__list_users_pages_with_cursor(client, database):
+    copy_users(generate_users(5))
+
+    emails = []
+    response = client.get("/api/users?limit=2")
+    while True:
+        page = response.get_json()
+        emails.extend(user["email"] for user in page["users"])
+        if page["next_cursor"] is None:
+            break
+        response = client.get(f"/api/users?limit=2&cursor={page['next_cursor']}")
+
+    assert emails == [f"user{i}@server.com" for i in range(5)]
+
+
+@pytest.mark.options(api_max_page_size=2)
+def test__list_users_caps_page_size(client, database):
+    copy_users(generate_users(3))
+
+    page = client.get("/api/users?limit=100").get_json()
+
+    assert len(page["users"]) == 2
+    assert page["next_cursor"] is not None
+
+
+def test__list_users_rejects_invalid_parameters(client, database):
+    assert client.get("/api/users?cursor=not-a-cursor").status_code == 400
+    assert client.get("/api/users?limit=0").status_code == 400
+
+
+def test__create_users_batch_skips_existing_emails(client, database):
+    database.session.add(User(email="user1@server.com"))
+    database.session.commit()
+
+    response = client.post(
+        "/api/users:batch",
+        json={"emails": ["user0@server.com", "user1@server.com", "user0@server.com"]},
+    )
+
+    result = response.get_json()
+    assert [user["email"] for user in result["created"]] == ["user0@server.com"]
+    assert result["skipped"] == ["user1@server.com"]
+    assert User.query.count() == 2
+
+
+@pytest.mark.options(api_max_batch_size=1)
+def test__create_users_batch_rejects_invalid_requests(client, database):
+    assert client.post("/api/users:batch", json={"emails": "x"}).status_code == 400
+    assert client.post("/api/users:batch", json=["a@b.c"]).status_code == 400
+    assert (
+        client.post("/api/users:batch", json={"emails": ["a", "b"]}).status_code
+        == 413
+    )
+
+
+def test__create_users_batch_skips_emails_differing_only_in_case(client, database):
+    response = client.post(
+        "/api/users:batch", json={"emails": ["User@server.com", "user@SERVER.com"]}
+    )
+
+    result = response.get_json()
+    assert [user["email"] for user in result["created"]] == ["User@server.com"]
+    assert result["skipped"] == ["user@SERVER.com"]
+
+
+def test__user_by_email_ignores_case(client, database):
+    database.session.add(User(email="Some.Email@server.com"))
+    database.session.commit()
+
+    response = client.get("/api/users/by-email?email=some.email@SERVER.COM")
+
+    assert response.get_json()["email"] == "Some.Email@server.com"
+    assert client.get("/api/users/by-email?email=other@server.com").status_code == 404
+
+
+@pytest.mark.options(users_missing_email_ttl=60)
+def test__user_by_email_caches_missing_emails_until_created(client, database):
+    url = "/api/users/by-email?email=new@server.com"
+    assert client.get(url).status_code == 404
+
+    # 绕过服务层直接写入，缓存的“不存在”结果仍然有效
+    database.session.add(User(email="new@server.com"))
+    database.session.commit()
+    assert client.get(url).status_code == 404
+
+    # 通过服务层创建用户会清除对应的缓存
+    client.post("/api/users:batch", json={"emails": ["new@server.com"]})
+    assert client.get(url).status_code == 200
@@ -0,0 +1,30 @@
+# 应用工厂：只在命令行中使用的扩展和 API 视图延迟加载
+from application.app import create_app
+from application.config import TestingConfig
+from application.urls import LazyView
+
+
+def test__migrate_is_registered_only_with_db_migrations(app, monkeypatch):
+    assert "migrate" not in app.extensions
+
+    monkeypatch.setattr(TestingConfig, "DB_MIGRATIONS", True)
+    cli_app = create_app("testing")
+
+    assert cli_app.extensions["migrate"].db is not None
+
+
+def test__lazy_view_imports_on_first_call():
+    view = LazyView("application.api.encode_cursor")
+    assert "view" not in view.__dict__
+    assert view.__name__ == "encode_cursor"
+
+    assert view(1) == "MQ"
+    assert "view" in view.__dict__
+
+
+def test__api_endpoints_use_lazy_views(app):
+    rules = {rule.endpoint: rule for rule in app.url_map.iter_rules()}
+
+    assert rules["api.users"].rule == "/api/users"
+    assert "POST" in rules["api.create_users_batch"].methods
+    assert isinstance(app.view_functions["api.users"], LazyView)
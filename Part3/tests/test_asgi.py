@@ -0,0 +1,88 @@
+# ASGI 入口：/users 通过异步连接池读取，其余路由交给 Flask
+import asyncio
+
+from asgiref.testing import ApplicationCommunicator
+
+from application.asgi import create_asgi_app
+from application.counters import clear_cache
+from application.models import db, Counter
+
+
+async def _get(app, path):
+    communicator = ApplicationCommunicator(
+        app,
+        {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "query_string": b"",
+            "headers": [(b"host", b"localhost")],
+            "server": ("localhost", 80),
+        },
+    )
+    await communicator.send_input({"type": "http.request", "body": b""})
+
+    start = await communicator.receive_output()
+    body = b""
+    while True:
+        message = await communicator.receive_output()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    return start["status"], dict(start["headers"]), body.decode("utf-8")
+
+
+# 完成 lifespan 启动（打开连接池），依次请求 paths，然后关闭
+async def _serve(app, paths):
+    lifespan = ApplicationCommunicator(app, {"type": "lifespan"})
+    await lifespan.send_input({"type": "lifespan.startup"})
+    assert (await lifespan.receive_output())["type"] == "lifespan.startup.complete"
+
+    try:
+        return [await _get(app, path) for path in paths]
+    finally:
+        await lifespan.send_input({"type": "lifespan.shutdown"})
+        await lifespan.receive_output()
+
+
+def test__asgi_users_reads_counter_through_async_pool(schema):
+    clear_cache()
+    app = create_asgi_app("testing")
+
+    [(status, headers, body)] = asyncio.run(_serve(app, ["/users"]))
+
+    # 异步连接池只能看到已提交的数据
+    with app.flask_app.app_context(), db.engine.connect() as connection:
+        expected = connection.execute(
+            db.select(Counter.value).where(Counter.name == "users")
+        ).scalar_one()
+    assert status == 200
+    assert body == f"Number of users: {expected}"
+    max_age = app.flask_app.config["USERS_CACHE_MAX_AGE"]
+    assert headers[b"cache-control"] == f"public, max-age={max_age}".encode()
+    assert app.pool.closed
+
+
+def test__asgi_delegates_other_routes_to_flask(schema):
+    app = create_asgi_app("testing")
+
+    [(status, _, body)] = asyncio.run(_serve(app, ["/"]))
+
+    assert status == 200
+    assert body == "Hello, World!"
+
+
+# 异步连接池在第一次使用时才建立连接
+def test__asgi_pool_connects_lazily(schema):
+    clear_cache()
+    app = create_asgi_app("testing")
+
+    asyncio.run(_serve(app, ["/"]))
+    assert app.pool.get_stats().get("connections_num", 0) == 0
+
+    app = create_asgi_app("testing")
+    asyncio.run(_serve(app, ["/users", "/users"]))
+    assert app.pool.get_stats()["connections_num"] == 1
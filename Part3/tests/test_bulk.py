@@ -0,0 +1,25 @@
+# 使用 COPY 批量写入用户
+from application.bulk import copy_users, generate_users, read_csv, read_jsonl
+from application.models import Counter, User
+
+
+def test__copy_users_loads_generated_rows(database):
+    count = copy_users(generate_users(100))
+
+    assert count == 100
+    assert User.query.count() == 100
+    # COPY 同样会触发计数表的触发器
+    assert database.session.get(Counter, "users").value == 100
+
+
+def test__copy_users_from_csv_and_jsonl(database, tmp_path):
+    csv_file = tmp_path / "users.csv"
+    csv_file.write_text("email\nuser1@server.com\nuser2@server.com\n")
+    jsonl_file = tmp_path / "users.jsonl"
+    jsonl_file.write_text('{"email": "user3@server.com"}\n\n')
+
+    copy_users(read_csv(csv_file))
+    copy_users(read_jsonl(jsonl_file))
+
+    emails = [user.email for user in User.query.order_by(User.id)]
+    assert emails == ["user1@server.com", "user2@server.com", "user3@server.com"]
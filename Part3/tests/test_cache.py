@@ -0,0 +1,145 @@
+# 应用缓存：LRU 和 Redis 后端、single-flight、提交后按标签失效
+import socket
+import threading
+import time
+
+import fakeredis
+
+from application.cache import MISSING, LRUBackend, RedisBackend, single_flight
+from application.models import User
+from application.services import list_users
+
+
+def test__lru_backend_evicts_least_recently_used():
+    backend = LRUBackend(max_entries=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")
+    backend.set("c", 3, ttl=60)
+
+    assert backend.get("a") == 1
+    assert backend.get("b") is MISSING
+    assert backend.get("c") == 3
+
+
+def test__lru_backend_expires_entries(monkeypatch):
+    backend = LRUBackend(max_entries=10)
+    backend.set("a", None, ttl=10)
+    assert backend.get("a") is None
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert backend.get("a") is MISSING
+
+
+def test__lru_backend_invalidates_by_tag():
+    backend = LRUBackend(max_entries=10)
+    backend.set("a", 1, ttl=60, tags=("users",))
+    backend.set("b", 2, ttl=60)
+
+    backend.invalidate("users")
+
+    assert backend.get("a") is MISSING
+    assert backend.get("b") == 2
+
+
+def test__redis_backend_invalidates_by_tag():
+    backend = RedisBackend(fakeredis.FakeRedis(), "test:")
+    backend.set("a", [{"id": 1}], ttl=60, tags=("users",))
+    backend.set("b", 2, ttl=60)
+    assert backend.get("a") == [{"id": 1}]
+
+    backend.invalidate("users")
+
+    assert backend.get("a") is MISSING
+    assert backend.get("b") == 2
+
+
+# Redis 不可用时按没有缓存处理，不抛出异常
+def test__redis_backend_survives_redis_errors():
+    server = fakeredis.FakeServer()
+    backend = RedisBackend(fakeredis.FakeRedis(server=server), "test:")
+    server.connected = False
+
+    backend.set("a", 1, ttl=60, tags=("users",))
+    assert backend.get("a") is MISSING
+    backend.invalidate("users")
+
+
+# Redis 接受连接但不响应时，读取在超时之后按未命中返回，而不是一直阻塞
+def test__stalled_redis_is_a_prompt_miss():
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        host, port = server.getsockname()
+        backend = RedisBackend.from_url(f"redis://{host}:{port}/0", "test:", 0.1)
+
+        start = time.monotonic()
+        assert backend.get("a") is MISSING
+        backend.set("a", 1, ttl=60)
+
+        assert time.monotonic() - start < 1
+
+
+# 并发的调用者只有一个执行计算，其余的得到相同的结果
+def test__single_flight_computes_once():
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 42
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(single_flight("k", compute)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [42] * 5
+
+
+# 执行计算的调用者卡住时，其余调用者等待 timeout 秒后自己计算
+def test__single_flight_waiters_time_out():
+    release = threading.Event()
+    leader = threading.Thread(
+        target=single_flight, args=("slow", lambda: release.wait(5)), daemon=True
+    )
+    leader.start()
+    time.sleep(0.05)
+
+    try:
+        start = time.monotonic()
+        assert single_flight("slow", lambda: 42, timeout=0.1) == 42
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        leader.join()
+
+
+def test__cached_query_is_invalidated_after_commit(app, database, monkeypatch):
+    monkeypatch.setitem(app.extensions, "cache", LRUBackend(max_entries=10))
+
+    with app.app_context():
+        assert list_users(0, 10) == []
+
+        # 不经过 ORM 的写入不会使缓存失效
+        database.session.execute(
+            database.text("INSERT INTO users (email) VALUES ('raw@server.com')")
+        )
+        database.session.commit()
+        assert list_users(0, 10) == []
+
+        database.session.add(User(email="some.email@server.com"))
+        database.session.commit()
+        emails = [user["email"] for user in list_users(0, 10)]
+
+    assert emails == ["raw@server.com", "some.email@server.com"]
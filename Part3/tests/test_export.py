@@ -0,0 +1,88 @@
+# 流式导出 users 表
+import csv
+import gzip
+
+import orjson
+
+from application.bulk import copy_users, generate_users
+from application.models import db
+
+
+# 把 users 表最后一次变化的时间提前，使那一秒已经过去
+def backdate_users(seconds):
+    db.session.execute(
+        db.text(
+            "UPDATE counters SET updated_at = updated_at - make_interval(secs => :s) "
+            "WHERE name = 'users'"
+        ),
+        {"s": seconds},
+    )
+    db.session.commit()
+
+
+def test__export_users_as_csv(client, database):
+    copy_users(generate_users(2))
+
+    response = client.get("/api/users/export?format=csv")
+
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(response.data.decode().splitlines()))
+    assert [row["email"] for row in rows] == ["user0@server.com", "user1@server.com"]
+
+
+def test__export_users_as_gzipped_ndjson(client, database):
+    copy_users(generate_users(3))
+
+    response = client.get(
+        "/api/users/export?format=ndjson", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    lines = gzip.decompress(response.data).splitlines()
+    assert [orjson.loads(line)["email"] for line in lines] == [
+        "user0@server.com",
+        "user1@server.com",
+        "user2@server.com",
+    ]
+
+
+def test__export_users_is_not_modified_until_users_change(client, database):
+    copy_users(generate_users(1))
+    backdate_users(2)
+    last_modified = client.get("/api/users/export").headers["Last-Modified"]
+
+    response = client.get(
+        "/api/users/export", headers={"If-Modified-Since": last_modified}
+    )
+
+    assert response.status_code == 304
+    assert response.data == b""
+
+    copy_users(generate_users(1, start=1))
+    response = client.get(
+        "/api/users/export", headers={"If-Modified-Since": last_modified}
+    )
+
+    assert response.status_code == 200
+
+
+# 在 users 表最后一次变化的那一秒之内，Last-Modified 无法区分之后的修改，不发送；
+# 客户端使用 ETag
+def test__export_users_in_the_same_second_as_a_write_uses_etag(client, database):
+    copy_users(generate_users(1))
+    response = client.get("/api/users/export")
+    response.close()
+    etag = response.headers["ETag"]
+
+    assert "Last-Modified" not in response.headers
+
+    response = client.get("/api/users/export", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    copy_users(generate_users(1, start=1))
+    response = client.get("/api/users/export", headers={"If-None-Match": etag})
+    response.close()
+
+    assert response.status_code == 200
@@ -0,0 +1,46 @@
+# ETag、Cache-Control 和条件请求（304）
+from application.models import User
+
+
+def test__users_route_answers_conditional_get_with_304(client, database):
+    response = client.get("/users")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    response = client.get("/users", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+
+def test__api_etag_changes_when_users_change(client, database):
+    etag = client.get("/api/users").headers["ETag"]
+    assert client.get("/api/users", headers={"If-None-Match": etag}).status_code == 304
+
+    database.session.add(User(email="some.email@server.com"))
+    database.session.commit()
+
+    response = client.get("/api/users", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.cache_control.no_cache
+
+
+# UPDATE 不改变行数，但同样会使 ETag 失效
+def test__api_etag_changes_when_users_are_updated(client, database):
+    database.session.add(User(email="some.email@server.com"))
+    database.session.commit()
+    etag = client.get("/api/users").headers["ETag"]
+
+    User.query.one().email = "other.email@server.com"
+    database.session.commit()
+
+    assert client.get("/api/users", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test__error_responses_have_no_etag(client, database):
+    response = client.get("/api/users?limit=0")
+
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
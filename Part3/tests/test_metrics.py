@@ -0,0 +1,35 @@
+# Prometheus 指标
+import os
+import subprocess
+import sys
+
+from prometheus_client import CollectorRegistry, multiprocess
+
+
+def test__metrics_include_request_latency_per_route(client, database):
+    client.get("/users")
+
+    body = client.get("/metrics").data.decode()
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/users"' in body
+    assert "db_pool_checked_out_connections" in body
+
+
+# 模拟两个 gunicorn worker：各自处理一个请求，指标汇总后计数为 2
+def test__metrics_are_aggregated_across_processes(tmp_path, schema):
+    worker = (
+        "from application.app import create_app; "
+        "create_app('testing').test_client().get('/')"
+    )
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for _ in range(2):
+        subprocess.check_call([sys.executable, "-c", worker], env=env)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+    count = registry.get_sample_value(
+        "http_request_duration_seconds_count",
+        {"method": "GET", "route": "/", "status": "200"},
+    )
+
+    assert count == 2
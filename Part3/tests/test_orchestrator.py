@@ -0,0 +1,91 @@
+# 场景编排：快照文件名的哈希和多个场景的失败汇总
+import asyncio
+import json
+
+import click
+import pytest
+
+import orchestrator
+from project_files import scenario_snapshot_file
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def write_config(path, values):
+    write(path, json.dumps([{"name": k, "value": v} for k, v in values.items()]))
+
+
+# 在临时目录中准备场景脚本、应用代码、迁移和配置文件
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write(tmp_path / "scenarios" / "demo.py", "def run(): pass\n")
+    write(tmp_path / "application" / "models.py", "# models\n")
+    write(tmp_path / "migrations" / "versions" / "0001.py", "# 0001\n")
+    write_config(tmp_path / "config" / "scenario_demo.json", {"APPLICATION_DB": "a"})
+
+    return tmp_path
+
+
+def snapshot(env=None):
+    return scenario_snapshot_file("demo", "scenario_demo", env or {})
+
+
+def test__snapshot_changes_with_scenario_and_migrations(project):
+    before = snapshot()
+    assert snapshot() == before
+
+    write(project / "scenarios" / "demo.py", "def run(): print()\n")
+    after_scenario = snapshot()
+    assert after_scenario != before
+
+    write(project / "migrations" / "versions" / "0002.py", "# 0002\n")
+    assert snapshot() != after_scenario
+
+
+def test__snapshot_changes_with_config(project):
+    before = snapshot({"APPLICATION_DB": "a"})
+
+    write_config(project / "config" / "scenario_demo.json", {"APPLICATION_DB": "b"})
+    assert snapshot({"APPLICATION_DB": "b"}) != before
+
+
+# 场景运行时的环境变量覆盖配置文件；数据库端口和无关的变量不影响快照
+def test__snapshot_changes_with_scenario_env(project):
+    env = {"APPLICATION_DB": "a"}
+    before = snapshot(env)
+
+    assert snapshot({**env, "APPLICATION_DB": "b"}) != before
+    assert snapshot({**env, "SCENARIO_USERS": "10"}) != before
+    assert snapshot({**env, "POSTGRES_PORT": "54321", "HOME": "/tmp"}) == before
+
+
+def test__run_all_reports_every_failed_scenario(capsys):
+    finished = []
+
+    async def action(scenario):
+        await asyncio.sleep(0)
+        if scenario.name != "ok":
+            raise click.ClickException(f"{scenario.name} broke")
+        finished.append(scenario.name)
+
+    with pytest.raises(click.ClickException, match="2 of 3 scenarios failed"):
+        asyncio.run(orchestrator._run_all(["a", "ok", "b", "a"], action))
+
+    # 一个场景失败不影响其他场景
+    assert finished == ["ok"]
+    err = capsys.readouterr().err
+    assert "Scenario a failed: a broke" in err
+    assert "Scenario b failed: b broke" in err
+
+
+def test__run_all_returns_scenarios_in_order():
+    async def action(scenario):
+        pass
+
+    scenarios = asyncio.run(orchestrator._run_all(["b", "a", "b"], action))
+
+    assert [scenario.name for scenario in scenarios] == ["b", "a"]
@@ -0,0 +1,87 @@
+# 连接池配置和 /_pool 状态接口
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from application.config import TestingConfig
+from application.models import db
+
+# 通过 PgBouncer 连接时没有应用端的连接池
+queue_pool_only = pytest.mark.skipif(
+    TestingConfig.PGBOUNCER, reason="PgBouncer mode uses NullPool"
+)
+
+
+@queue_pool_only
+def test__engine_uses_pool_options_from_config(app):
+    with app.app_context():
+        pool = db.engine.pool
+
+    options = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    assert pool.size() == options["pool_size"]
+    assert pool._max_overflow == options["max_overflow"]
+
+
+# 请求处理期间额外持有的连接应当被统计为 checked_out
+@queue_pool_only
+def test__pool_route_reports_checked_out_connections(client, database):
+    before = client.get("/_pool").get_json()
+
+    with database.engine.connect():
+        after = client.get("/_pool").get_json()
+
+    assert after["checked_out"] == before["checked_out"] + 1
+    assert after["overflow"] == 0
+
+
+# 使用 PgBouncer 时应用端不保留连接（NullPool），也不使用服务器端预备语句；
+# 副本不经过 PgBouncer，仍然使用连接池；asgi 的连接池使用配置的连接池参数。
+# 配置在导入时读取环境变量，所以在子进程中
+# 创建应用，PgBouncer 的地址指向测试数据库
+PGBOUNCER_CHECK = """
+import json
+from application.app import create_app
+from application.asgi import create_asgi_app
+from application.models import db
+
+app = create_app("testing")
+client = app.test_client()
+statuses = [client.get("/users").status_code for _ in range(10)]
+with app.app_context():
+    with db.engine.connect() as conn:
+        prepare_threshold = conn.connection.driver_connection.prepare_threshold
+    replica = db.engines["replica_0"].pool
+async_pool = create_asgi_app("testing").pool
+print(json.dumps({
+    "statuses": statuses,
+    "pool": client.get("/_pool").get_json()["pool"],
+    "prepare_threshold": prepare_threshold,
+    "replica_pool": type(replica).__name__,
+    "replica_size": replica.size(),
+    "async_timeout": async_pool.timeout,
+    "async_kwargs": async_pool.kwargs,
+}))
+"""
+
+
+def test__pgbouncer_config_uses_null_pool_for_primary_only(schema):
+    env = {
+        **os.environ,
+        "PGBOUNCER": "1",
+        "PGBOUNCER_HOSTNAME": os.environ["POSTGRES_HOSTNAME"],
+        "PGBOUNCER_PORT": os.environ["POSTGRES_PORT"],
+        "POSTGRES_REPLICAS": "localhost:5434",
+    }
+    output = subprocess.check_output([sys.executable, "-c", PGBOUNCER_CHECK], env=env)
+    result = json.loads(output)
+
+    assert result["statuses"] == [200] * 10
+    assert result["pool"] == "NullPool"
+    assert result["prepare_threshold"] is None
+    assert result["replica_pool"] == "QueuePool"
+    assert result["replica_size"] == TestingConfig.pool_options["pool_size"]
+    assert result["async_timeout"] == TestingConfig.pool_options["pool_timeout"]
+    assert result["async_kwargs"] == {"prepare_threshold": None}
@@ -0,0 +1,23 @@
+# 按请求统计 SQL
+from application.app import create_app
+from application.config import TestingConfig
+
+
+def test__profiling_is_disabled_by_default(client, database):
+    response = client.get("/users")
+
+    assert "Server-Timing" not in response.headers
+    assert client.get("/_debug/queries").status_code == 404
+
+
+def test__profiling_reports_queries_per_request(monkeypatch, schema):
+    monkeypatch.setattr(TestingConfig, "SQL_PROFILING", True)
+    client = create_app("testing").test_client()
+
+    response = client.get("/users")
+
+    assert response.headers.getlist("Server-Timing")[0].startswith("db;dur=")
+    history = client.get("/_debug/queries").get_json()
+    assert history[0]["path"] == "/users"
+    assert history[0]["queries"] == 1
+    assert "counters" in history[0]["slowest"]["statement"]
@@ -0,0 +1,153 @@
+# 只读副本：读取轮询发送到副本，写入之后粘在主库，出错的副本暂时不用
+import os
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from application.app import create_app
+from application.config import TestingConfig
+from application.models import db, User
+from application.replicas import use_primary
+
+
+# 设置 TestingConfig 的副本 bind。init_app 会把 bind 加入全局的 db.metadatas，
+# 测试结束时删除新加入的 bind，否则会话级应用的 drop_all/create_all 会因为
+# 配置中没有这些 bind 而失败
+@pytest.fixture
+def replica_binds(monkeypatch):
+    added = []
+
+    def set_binds(binds):
+        monkeypatch.setattr(TestingConfig, "SQLALCHEMY_BINDS", binds)
+        added.extend(key for key in binds if key not in db.metadatas)
+
+    yield set_binds
+
+    for key in added:
+        db.metadatas.pop(key, None)
+
+
+# 两个指向测试数据库本身的“副本”，用来检查路由，不需要真正的复制
+@pytest.fixture
+def replica_app(replica_binds, schema):
+    uri = TestingConfig.SQLALCHEMY_DATABASE_URI
+    replica_binds({"replica_0": uri, "replica_1": uri})
+    app = create_app("testing")
+
+    with app.app_context():
+        yield app
+        db.session.rollback()
+        db.session.remove()
+
+
+def test__each_session_reads_from_one_replica(replica_app):
+    engines = db.engines
+    select = db.select(User)
+
+    # 同一个会话的读取固定使用一个副本
+    binds = [db.session.get_bind(clause=select) for _ in range(3)]
+    assert binds == [engines["replica_0"]] * 3
+
+    # 新的会话（下一个请求）按轮询使用下一个副本
+    db.session.remove()
+    assert db.session.get_bind(clause=select) is engines["replica_1"]
+
+
+def test__use_primary_sends_reads_to_primary(replica_app):
+    use_primary(db.session)
+
+    assert db.session.get_bind(clause=db.select(User)) is db.engine
+
+
+def test__session_sticks_to_primary_after_writing(replica_app):
+    db.session.add(User(email="some.email@server.com"))
+    db.session.flush()
+
+    assert db.session.get_bind(clause=db.select(User)) is db.engine
+    assert User.query.filter_by(email="some.email@server.com").count() == 1
+
+
+def test__select_for_update_is_sent_to_primary(replica_app):
+    assert db.session.get_bind(clause=db.select(User).with_for_update()) is db.engine
+
+
+def test__failed_replica_is_skipped(replica_app):
+    replicas = replica_app.extensions["replicas"]
+    replicas.mark_down(0)
+
+    assert [replicas.choose() for _ in range(2)] == [db.engines["replica_1"]] * 2
+
+    replicas.mark_down(1)
+    assert db.session.get_bind(clause=db.select(User)) is db.engine
+
+
+# 会话使用的副本变为不可用时改用主库，而不是换到另一个副本
+def test__session_falls_back_to_primary_when_its_replica_fails(replica_app):
+    replicas = replica_app.extensions["replicas"]
+    assert db.session.get_bind(clause=db.select(User)) is db.engines["replica_0"]
+
+    replicas.mark_down(0)
+
+    assert db.session.get_bind(clause=db.select(User)) is db.engine
+
+
+# 复制延迟超过 max_lag 的副本暂时不用，每个副本最多每 lag_check_interval 秒检查一次
+def test__lagging_replica_is_skipped(replica_app, monkeypatch):
+    replicas = replica_app.extensions["replicas"]
+    replicas.max_lag = 5
+    lags = {0: 30, 1: 0}
+    checks = []
+
+    def lag(i):
+        checks.append(i)
+        return lags[i]
+
+    monkeypatch.setattr(replicas, "lag", lag)
+
+    assert [replicas.choose() for _ in range(3)] == [db.engines["replica_1"]] * 3
+    assert checks == [0, 1]
+
+
+def test__connection_errors_mark_replica_down(replica_binds, schema):
+    replica_binds({"replica_0": "postgresql+psycopg://nobody@127.0.0.1:1/nothing"})
+    app = create_app("testing")
+
+    with app.app_context():
+        with pytest.raises(OperationalError):
+            db.session.execute(db.select(User)).all()
+        db.session.rollback()
+
+        # 副本被标记为不可用，读取回到主库
+        assert db.session.execute(db.select(User)).all() is not None
+        db.session.remove()
+
+
+# 需要 docker/testing.yml 中的副本（./manage.py test 会启动它）
+@pytest.mark.skipif(
+    not os.getenv("POSTGRES_REPLICAS"), reason="POSTGRES_REPLICAS is not set"
+)
+def test__replica_serves_committed_rows(app, schema):
+    email = f"replicated.{time.time_ns()}@server.com"
+
+    with app.app_context():
+        db.session.add(User(email=email))
+        db.session.commit()
+        db.session.remove()
+
+        # 测试数据库的副本没有复制延迟
+        assert app.extensions["replicas"].lag(0) < 5
+
+        # 等待复制完成
+        deadline = time.monotonic() + 10
+        while True:
+            user = db.session.execute(db.select(User).filter_by(email=email)).first()
+            assert db.session.get_bind(clause=db.select(User)) is not db.engine
+            db.session.remove()
+            if user is not None or time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+
+        assert user is not None
+        db.session.execute(db.delete(User).filter_by(email=email))
+        db.session.commit()
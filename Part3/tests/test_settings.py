@@ -0,0 +1,126 @@
+# 类型化的配置和分层的配置文件
+import json
+import os
+
+import pytest
+
+import manage
+from application.settings import Settings, load_files
+
+REQUIRED = {
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_HOSTNAME": "localhost",
+    "POSTGRES_PORT": "5432",
+    "APPLICATION_DB": "application",
+}
+
+
+def write_config(path, name, values):
+    with open(path / f"{name}.json", "w") as f:
+        json.dump([{"name": k, "value": v} for k, v in values.items()], f)
+
+
+def test__settings_convert_types_and_use_defaults():
+    settings = Settings.from_environ(
+        {
+            **REQUIRED,
+            "SQLALCHEMY_POOL_PRE_PING": "1",
+            "POSTGRES_REPLICAS": "replica1:5432,replica2:5432",
+            # docker compose 把没有设置的变量替换为空字符串
+            "SQLALCHEMY_POOL_SIZE": "",
+        }
+    )
+
+    assert settings.POSTGRES_PORT == 5432
+    assert settings.SQLALCHEMY_POOL_PRE_PING is True
+    assert settings.POSTGRES_REPLICAS == ("replica1:5432", "replica2:5432")
+    assert settings.SQLALCHEMY_POOL_SIZE == 5
+
+
+def test__settings_report_all_errors():
+    environ = {**REQUIRED, "METRICS": "maybe", "API_PAGE_SIZE": "ten"}
+    del environ["APPLICATION_DB"]
+
+    with pytest.raises(ValueError) as excinfo:
+        Settings.from_environ(environ)
+
+    message = str(excinfo.value)
+    assert "METRICS='maybe'" in message
+    assert "API_PAGE_SIZE='ten'" in message
+    assert "APPLICATION_DB must be set" in message
+
+
+# environ() 写入环境变量的值可以还原为同一个 Settings，不需要再次解析
+def test__settings_environ_round_trips():
+    settings = Settings.from_environ({**REQUIRED, "SQLALCHEMY_POOL_PRE_PING": "yes"})
+    environ = settings.environ()
+
+    assert environ["SQLALCHEMY_POOL_PRE_PING"] == "1"
+    assert environ["POSTGRES_REPLICAS"] == ""
+    assert Settings.from_environ(environ) is settings
+
+
+# manage.py 把配置文件和环境变量合并后用 Settings 校验，写入校验后的值；
+# 应用从这些环境变量得到同一个 Settings
+def test__configure_app_writes_validated_settings(tmp_path, monkeypatch):
+    write_config(
+        tmp_path,
+        "staging",
+        {**REQUIRED, "SQLALCHEMY_POOL_PRE_PING": "true", "FLASK_DEBUG": "1"},
+    )
+    monkeypatch.setattr(manage, "APPLICATION_CONFIG_PATH", str(tmp_path))
+    monkeypatch.setattr(manage, "_configured", None)
+    environ = {"POSTGRES_PORT": "6543"}
+    monkeypatch.setattr(os, "environ", environ)
+
+    manage.configure_app("staging")
+
+    assert environ["SQLALCHEMY_POOL_PRE_PING"] == "1"
+    assert environ["POSTGRES_PORT"] == "6543"
+    assert environ["FLASK_DEBUG"] == "1"
+    settings = Settings.from_environ(environ)
+    assert settings.POSTGRES_PORT == 6543
+    assert settings is Settings.from_environ(
+        {**REQUIRED, "SQLALCHEMY_POOL_PRE_PING": "true", "POSTGRES_PORT": "6543"}
+    )
+
+
+def test__configure_app_rejects_invalid_environment(tmp_path, monkeypatch):
+    write_config(tmp_path, "staging", REQUIRED)
+    monkeypatch.setattr(manage, "APPLICATION_CONFIG_PATH", str(tmp_path))
+    monkeypatch.setattr(manage, "_configured", None)
+    monkeypatch.setattr(os, "environ", {"POSTGRES_PORT": "next"})
+
+    with pytest.raises(ValueError, match="POSTGRES_PORT='next'"):
+        manage.configure_app("staging")
+
+
+def test__load_files_merges_layers(tmp_path):
+    write_config(tmp_path, "base", {"METRICS": "0", "API_PAGE_SIZE": "10"})
+    write_config(tmp_path, "staging", {"API_PAGE_SIZE": "20", "FLASK_DEBUG": "0"})
+    write_config(tmp_path, "staging.local", {"FLASK_DEBUG": "1"})
+
+    values = load_files("staging", str(tmp_path))
+
+    assert values == {"METRICS": "0", "API_PAGE_SIZE": "20", "FLASK_DEBUG": "1"}
+
+
+def test__load_files_is_cached_until_a_file_changes(tmp_path):
+    write_config(tmp_path, "staging", {"API_PAGE_SIZE": "20"})
+
+    values = load_files("staging", str(tmp_path))
+    assert load_files("staging", str(tmp_path)) is values
+
+    write_config(tmp_path, "staging.local", {"API_PAGE_SIZE": "30"})
+    assert load_files("staging", str(tmp_path))["API_PAGE_SIZE"] == "30"
+
+    os.remove(tmp_path / "staging.local.json")
+    assert load_files("staging", str(tmp_path))["API_PAGE_SIZE"] == "20"
+
+
+def test__load_files_validates_types(tmp_path):
+    write_config(tmp_path, "staging", {"SQLALCHEMY_POOL_SIZE": "five"})
+
+    with pytest.raises(ValueError, match="SQLALCHEMY_POOL_SIZE='five'"):
+        load_files("staging", str(tmp_path))
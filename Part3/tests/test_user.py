@@ -1,5 +1,5 @@
 # 简易tdd测试
-from application.models import User
+from application.models import Counter, User
 
 
 # 测试在数据库中创建一个用户，然后检索该用户并检查其属性
@@ -13,3 +13,35 @@ def test__create_user(database):
 
     # 如果model中没有User类，或者User类没有email属性，运行此测试会报错
     assert user.email == email
+
+
+# 计数表由触发器维护，插入和删除用户后都应与 users 表的实际行数一致
+def test__users_counter_follows_inserts_and_deletes(database):
+    database.session.add_all(
+        [User(email="user1@server.com"), User(email="user2@server.com")]
+    )
+    database.session.commit()
+
+    assert database.session.get(Counter, "users").value == 2
+
+    database.session.delete(User.query.filter_by(email="user1@server.com").one())
+    database.session.commit()
+
+    assert database.session.get(Counter, "users").value == 1
+
+
+def test__users_route_returns_count(client, database):
+    database.session.add(User(email="some.email@server.com"))
+    database.session.commit()
+
+    response = client.get("/users")
+
+    assert response.data == b"Number of users: 1"
+
+
+# nginx 根据 Cache-Control 对 /users 做微缓存
+def test__users_route_is_cacheable_by_shared_caches(app, client, database):
+    response = client.get("/users")
+
+    assert response.cache_control.public
+    assert response.cache_control.max_age == app.config["USERS_CACHE_MAX_AGE"]